@@ -0,0 +1,97 @@
+"""
+Online backup throughput and its effect on request-path query latency.
+
+Fills a scratch database, then measures point lookups on an aiosqlite connection (as the
+repositories issue them) while idle and while core.backup copies the database in steps.
+
+Run from backend/:  python -m benchmarks.bench_backup [--rows 200000] [--step-pages 256] [--sleep-ms 5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import aiosqlite  # noqa: E402
+
+from core.backup import backup_database  # noqa: E402
+
+
+def _fill(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT UNIQUE, name TEXT, payload TEXT)")
+    conn.executemany(
+        "INSERT INTO users (email, name, payload) VALUES (?, ?, ?)",
+        ((f"user{i}@example.com", f"User {i}", "x" * 200) for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _probe(conn: aiosqlite.Connection, rows: int, stop: asyncio.Event) -> list:
+    rng = random.Random(3)
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        cursor = await conn.execute("SELECT * FROM users WHERE email = ?", (f"user{rng.randrange(rows)}@example.com",))
+        await cursor.fetchone()
+        await cursor.close()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+    return latencies
+
+
+def _report(label: str, latencies: list) -> None:
+    ms = sorted(x * 1000 for x in latencies)
+    p99 = ms[int(len(ms) * 0.99) - 1] if len(ms) >= 100 else ms[-1]
+    print(f"{label:<14} {len(ms):>8} queries  p50 {statistics.median(ms):.3f} ms  p99 {p99:.3f} ms  max {ms[-1]:.3f} ms")
+
+
+async def _run(args) -> None:
+    with tempfile.TemporaryDirectory() as work:
+        db_path = os.path.join(work, "bench.db")
+        _fill(db_path, args.rows)
+        print(f"database: {args.rows} rows, {os.path.getsize(db_path) / 1024 / 1024:.1f} MiB")
+        conn = await aiosqlite.connect(db_path)
+        try:
+            stop = asyncio.Event()
+            probe = asyncio.create_task(_probe(conn, args.rows, stop))
+            await asyncio.sleep(args.idle_seconds)
+            stop.set()
+            _report("idle", await probe)
+
+            stop = asyncio.Event()
+            probe = asyncio.create_task(_probe(conn, args.rows, stop))
+            result = await asyncio.to_thread(
+                backup_database, db_path, os.path.join(work, "backups"),
+                args.step_pages, args.sleep_ms / 1000, args.compress,
+            )
+            stop.set()
+            _report("during backup", await probe)
+        finally:
+            await conn.close()
+        print(
+            f"backup: {result.pages} pages in {result.seconds:.2f} s, {result.mb_per_second:.1f} MiB/s, "
+            f"{result.bytes_written / 1024 / 1024:.1f} MiB written, {result.restarts} restarts"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--step-pages", type=int, default=256)
+    parser.add_argument("--sleep-ms", type=float, default=5.0)
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    parser.add_argument("--compress", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Credential lookup cost: POST /api/auth/s3-credentials vs the Unix credential socket.
+
+Both run in-process against a scratch database. HTTP goes through httpx's ASGI transport
+(no network, so a lower bound for real HTTP). The socket is measured one request at a
+time and pipelined in batches, first cold (every lookup reads SQLite) and then warm
+(served from the lookup cache; CREDENTIAL_SOCKET_CACHE_SECONDS defaults to 30 here so
+the cache outlives the run).
+
+Run from backend/:  python -m benchmarks.bench_credentials [--keys 1000] [--lookups 5000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+SECRET = "bench-service-secret"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["WARPDRIVE_SERVICE_SECRET"] = SECRET
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["LOOP_MONITOR_ENABLED"] = "false"
+os.environ.setdefault("CREDENTIAL_SOCKET_CACHE_SECONDS", "30")
+
+
+def _report(label: str, n: int, seconds: float) -> None:
+    print(f"{label:<32} {n / seconds:>10,.0f} lookups/s  {seconds / n * 1e6:>8.1f} µs/lookup")
+
+
+async def _run(args, work: str) -> None:
+    os.environ["DATABASE_PATH"] = os.path.join(work, "bench.db")
+    os.environ["CREDENTIAL_SOCKET_PATH"] = os.path.join(work, "credentials.sock")
+
+    import httpx
+
+    from core import database
+    from core.credential_socket import CredentialSocketClient, start_credential_socket, stop_credential_socket
+    from main import app
+
+    await database.init_sqlite()
+    await start_credential_socket()
+    try:
+        keys = []
+        for i in range(args.keys):
+            owner = f"user{i}@example.com"
+            await database.get_user_repo().create_if_absent({"email": owner})
+            await database.get_bucket_repo().create_if_absent({"bucket_name": "default", "owner_id": owner})
+            await database.get_api_key_repo().create(f"AK{i:018d}", owner, "s" * 40)
+            keys.append(f"AK{i:018d}")
+        rng = random.Random(1)
+        lookups = [rng.choice(keys) for _ in range(args.lookups)]
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://console") as http:
+            headers = {"X-Warpdrive-Secret": SECRET}
+            started = time.perf_counter()
+            for key in lookups:
+                r = await http.post("/api/auth/s3-credentials", json={"access_key": key}, headers=headers)
+                assert r.status_code == 200
+            _report("HTTP (in-process)", len(lookups), time.perf_counter() - started)
+
+        client = await CredentialSocketClient.connect(os.environ["CREDENTIAL_SOCKET_PATH"], SECRET)
+        try:
+            cold = list(range(len(keys)))
+            started = time.perf_counter()
+            for i in cold[: len(cold) // 2]:
+                status, _ = await client.lookup(keys[i])
+                assert status == 0
+            _report("socket, one at a time, cold", len(cold) // 2, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            rest = [(keys[i], None) for i in cold[len(cold) // 2:]]
+            for i in range(0, len(rest), args.batch):
+                await client.lookup_many(rest[i:i + args.batch])
+            _report(f"socket, pipelined x{args.batch}, cold", len(rest), time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for key in lookups:
+                await client.lookup(key)
+            _report("socket, one at a time, warm", len(lookups), time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for i in range(0, len(lookups), args.batch):
+                await client.lookup_many([(key, None) for key in lookups[i:i + args.batch]])
+            _report(f"socket, pipelined x{args.batch}, warm", len(lookups), time.perf_counter() - started)
+
+            _, bundle = await client.lookup(lookups[0])
+            started = time.perf_counter()
+            for i in range(0, len(lookups), args.batch):
+                await client.lookup_many([(lookups[0], bundle.version)] * args.batch)
+            _report("socket, revalidation, warm", len(lookups), time.perf_counter() - started)
+        finally:
+            await client.close()
+    finally:
+        await stop_credential_socket()
+        await database.close_sqlite()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as work:
+        asyncio.run(_run(args, work))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Access-policy decisions per second.
+
+  compiled  CompiledPolicy.evaluate on a policy already in hand
+  cached    authorize(): owner check + content-hash cache lookup + evaluate
+  cold      compile_policy + evaluate for every decision (no cache)
+
+Run from backend/:  python -m benchmarks.bench_policy [--statements 50]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from services.policy_engine import authorize, compile_policy  # noqa: E402
+
+ACTIONS = ("s3:GetObject", "s3:PutObject", "s3:DeleteObject", "s3:ListBucket")
+
+
+def _policy(statements: int) -> str:
+    rng = random.Random(1)
+    doc = []
+    for i in range(statements):
+        kind = i % 4
+        resource = (
+            f"team-{i}/*" if kind == 0
+            else f"shared/{i}/report.csv" if kind == 1
+            else f"logs/*/{i}/*.gz" if kind == 2
+            else "*"
+        )
+        doc.append({
+            "Effect": "Deny" if i % 10 == 9 else "Allow",
+            "Principal": [f"user{rng.randrange(1000)}@example.com" for _ in range(3)] if kind != 3 else "*",
+            "Action": "s3:Get*" if kind == 3 else rng.choice(ACTIONS),
+            "Resource": resource,
+        })
+    return json.dumps({"Statement": doc})
+
+
+def _requests(n: int):
+    rng = random.Random(2)
+    keys = ("team-4/data/part-0001.parquet", "shared/1/report.csv", "logs/2024/2/app.gz", "other/file.bin")
+    return [
+        (f"user{rng.randrange(1000)}@example.com", rng.choice(ACTIONS), rng.choice(keys))
+        for _ in range(n)
+    ]
+
+
+def _rate(fn, requests) -> float:
+    start = time.perf_counter()
+    for principal, action, key in requests:
+        fn(principal, action, key)
+    return len(requests) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--statements", type=int, default=50)
+    parser.add_argument("--decisions", type=int, default=200_000)
+    args = parser.parse_args()
+
+    text = _policy(args.statements)
+    row = {"bucket_name": "bench", "owner_id": "owner@example.com", "access_policies": text}
+    compiled = compile_policy(text, "bench")
+    requests = _requests(args.decisions)
+
+    print(f"policy: {args.statements} statements, {len(text)} bytes")
+    print(f"compiled {_rate(compiled.evaluate, requests):>12,.0f} decisions/s")
+    print(f"cached   {_rate(lambda p, a, k: authorize(row, p, a, k), requests):>12,.0f} decisions/s")
+    cold = requests[: max(1, args.decisions // 100)]
+    print(f"cold     {_rate(lambda p, a, k: compile_policy(text, 'bench').evaluate(p, a, k), cold):>12,.0f} decisions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Microbenchmarks for every method of the user, API key and bucket repositories, against
+a synthetic database (benchmarks.dataset), with one caller and with --concurrency callers
+sharing the connection as requests do. The database is opened with the app's pragmas, so
+SQLITE_* settings (e.g. SQLITE_PROFILE=production) can be compared directly.
+
+Each benchmark runs for --seconds (at least --min-ops operations). Write benchmarks use
+"bench-" rows, deleted afterwards (today's daily_rollups counts keep the increments).
+Results can be saved as a named baseline and later compared against it; the comparison
+flags ops/s and p99 changes beyond --threshold and exits 1 on regressions. Run-to-run
+noise on a busy machine can exceed 10%, so compare runs of a few seconds each.
+
+Run from backend/:
+    python -m benchmarks.dataset --users 1000000 --out data/bench.db
+    python -m benchmarks.bench_repositories --db data/bench.db --save before
+    # change an index, pragma, ...
+    python -m benchmarks.bench_repositories --db data/bench.db --compare before
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import aiosqlite  # noqa: E402
+
+from benchmarks.dataset import access_key, generate, google_id, user_email  # noqa: E402
+from config import Settings  # noqa: E402
+from core.database import apply_pragmas, sqlite_pragmas  # noqa: E402
+from repositories import SQLiteApiKeyRepository, SQLiteBucketRepository, SQLiteUserRepository  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+Op = Callable[[int], Awaitable[object]]
+
+
+class Dataset:
+    def __init__(self, users: int, key_owners: List[int], last_seq: int):
+        self.users = users
+        self.key_owners = key_owners
+        self.last_seq = last_seq
+
+
+def _inspect(path: str) -> Dataset:
+    conn = sqlite3.connect(path)
+    try:
+        users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        owners = [
+            int(row[0][4:12])
+            for row in conn.execute("SELECT owner_id FROM api_keys WHERE owner_id LIKE 'user%' LIMIT 100000")
+        ]
+        last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM api_key_changes").fetchone()[0]
+    finally:
+        conn.close()
+    return Dataset(users, owners, last_seq)
+
+
+def _benchmarks(conn: aiosqlite.Connection, data: Dataset) -> Dict[str, Tuple[Op, bool]]:
+    """name -> (op(i), heavy). Heavy ops scan a large share of a table and run fewer times."""
+    users = SQLiteUserRepository(conn)
+    keys = SQLiteApiKeyRepository(conn)
+    buckets = SQLiteBucketRepository(conn)
+    rng = random.Random(7)
+    n = data.users
+
+    def any_user() -> int:
+        return rng.randrange(n)
+
+    def key_owner() -> int:
+        return rng.choice(data.key_owners)
+
+    def bench_user(i: int) -> dict:
+        now = datetime.utcnow()
+        return {"email": f"bench-{i}@example.com", "full_name": "Bench", "auth_provider": "email",
+                "created_at": now, "updated_at": now}
+
+    return {
+        "users.get_by_email": (lambda i: users.get_by_email(user_email(any_user())), False),
+        "users.get_by_google_id": (lambda i: users.get_by_google_id(google_id(any_user() // 3 * 3)), True),
+        "users.create": (lambda i: users.create(bench_user(i)), False),
+        "users.create_if_absent(existing)": (lambda i: users.create_if_absent({"email": user_email(any_user())}), False),
+        "users.update": (lambda i: users.update(user_email(any_user()), {"full_name": f"Renamed {i}"}), False),
+        "api_keys.get_by_access_key": (lambda i: keys.get_by_access_key(access_key(key_owner())), False),
+        "api_keys.get_by_owner_id": (lambda i: keys.get_by_owner_id(user_email(any_user())), False),
+        "api_keys.create": (lambda i: keys.create(f"BENCH{i:015d}", f"bench-{i}@example.com", "s" * 40), False),
+        "api_keys.create_if_owner_has_none(existing)": (
+            lambda i: keys.create_if_owner_has_none(f"BENCHX{i:014d}", user_email(key_owner()), "s" * 40), False,
+        ),
+        "api_keys.delete_by_owner_id": (lambda i: keys.delete_by_owner_id(f"bench-{i}@example.com"), False),
+        "api_keys.list_by_owner_id": (lambda i: keys.list_by_owner_id(user_email(any_user())), False),
+        "api_keys.list_active": (lambda i: keys.list_active(), True),
+        "api_keys.list_changes": (lambda i: keys.list_changes(rng.randrange(max(1, data.last_seq)), 500), False),
+        "api_keys.latest_change_seq": (lambda i: keys.latest_change_seq(), False),
+        "buckets.create": (lambda i: buckets.create({"bucket_name": f"bench-{i}", "owner_id": user_email(any_user())}), False),
+        "buckets.create_if_absent(existing)": (
+            lambda i: buckets.create_if_absent({"bucket_name": "default", "owner_id": user_email(any_user())}), False,
+        ),
+        "buckets.list_by_owner_id": (lambda i: buckets.list_by_owner_id(user_email(any_user())), False),
+        "buckets.get_by_owner_and_name": (lambda i: buckets.get_by_owner_and_name(user_email(any_user()), "default"), False),
+        "buckets.get_version": (lambda i: buckets.get_version(user_email(any_user())), False),
+    }
+
+
+async def _run(op: Op, concurrency: int, seconds: float, min_ops: int, counter: itertools.count) -> dict:
+    latencies: List[float] = []
+    deadline = time.perf_counter() + seconds
+
+    async def caller() -> None:
+        while time.perf_counter() < deadline or len(latencies) < min_ops:
+            started = time.perf_counter()
+            await op(next(counter))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 4),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 4),
+    }
+
+
+async def _cleanup(conn: aiosqlite.Connection) -> None:
+    await conn.execute("DELETE FROM api_keys WHERE access_key LIKE 'BENCH%'")
+    await conn.execute("DELETE FROM api_key_changes WHERE access_key LIKE 'BENCH%'")
+    await conn.execute("DELETE FROM buckets WHERE bucket_name LIKE 'bench-%'")
+    await conn.execute("DELETE FROM users WHERE email LIKE 'bench-%'")
+    await conn.commit()
+
+
+async def run_suite(path: str, concurrency: int, seconds: float, min_ops: int, only: Optional[str]) -> dict:
+    data = _inspect(path)
+    settings = Settings()
+    conn = await aiosqlite.connect(path)
+    results: Dict[str, dict] = {}
+    try:
+        await apply_pragmas(conn, sqlite_pragmas(settings))
+        counter = itertools.count()
+        for name, (op, heavy) in _benchmarks(conn, data).items():
+            if only and only not in name:
+                continue
+            for callers in sorted({1, concurrency}):
+                budget = seconds / 4 if heavy else seconds
+                result = await _run(op, callers, budget, 1 if heavy else min_ops, counter)
+                results[f"{name}@{callers}"] = result
+                print(
+                    f"{name + '@' + str(callers):<48} {result['ops_per_sec']:>10,.0f} ops/s"
+                    f"  p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms"
+                )
+    finally:
+        await _cleanup(conn)
+        await conn.close()
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "users": data.users,
+            "db_bytes": os.path.getsize(path),
+            "sqlite_profile": settings.sqlite_profile,
+            "sqlite_version": sqlite3.sqlite_version,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "concurrency": concurrency,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Print a comparison table; returns the number of regressions."""
+    regressions = 0
+    print(f"\nCompared with baseline from {baseline['meta']['created_at']} "
+          f"({baseline['meta']['users']:,} users, profile {baseline['meta']['sqlite_profile']}):")
+    print(f"{'benchmark':<48} {'ops/s':>10} {'Δ':>8} {'p99 ms':>10} {'Δ':>8}")
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<48} {now['ops_per_sec']:>10,.0f} {'new':>8}")
+            continue
+        d_ops = now["ops_per_sec"] / before["ops_per_sec"] - 1 if before["ops_per_sec"] else 0.0
+        d_p99 = now["p99_ms"] / before["p99_ms"] - 1 if before["p99_ms"] else 0.0
+        flag = ""
+        if d_ops < -threshold or d_p99 > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif d_ops > threshold:
+            flag = "  faster"
+        print(f"{name:<48} {now['ops_per_sec']:>10,.0f} {d_ops:>+8.1%} {now['p99_ms']:>10.3f} {d_p99:>+8.1%}{flag}")
+    if baseline["meta"]["users"] != current["meta"]["users"]:
+        print("Note: the datasets differ in size; deltas are not like for like.")
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Repository microbenchmarks.")
+    parser.add_argument("--db", default="data/bench.db", help="generated with benchmarks.dataset if missing")
+    parser.add_argument("--users", type=int, default=100_000, help="dataset size when generating")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=1.0, help="per benchmark and caller count")
+    parser.add_argument("--min-ops", type=int, default=20)
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--save", metavar="NAME", help="store results as baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare with baselines/NAME.json")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+        print(f"Generating {args.db} with {args.users:,} users")
+        generate(args.db, args.users, 10.0, 0.8)
+
+    current = asyncio.run(run_suite(args.db, args.concurrency, args.seconds, args.min_ops, args.only))
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if compare(baseline, current, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
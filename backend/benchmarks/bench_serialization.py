@@ -0,0 +1,71 @@
+"""
+Serialization cost of the bucket list response for 1, 100 and 10,000 buckets.
+
+  before       FastAPI response_model path: re-validate list[BucketSummary],
+               dump to JSON-compatible python, stdlib json.dumps (JSONResponse)
+  default      same response_model path rendered by FastJSONResponse (orjson if installed)
+  prevalidated prevalidated(): pydantic-core dump_json on the provider's models
+
+Run from backend/:  python -m benchmarks.bench_serialization
+"""
+import json
+import os
+import timeit
+from typing import List
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from core.responses import FastJSONResponse, prevalidated  # noqa: E402
+from services.storage_usage_provider import BucketSummary  # noqa: E402
+
+ADAPTER = TypeAdapter(List[BucketSummary])
+SIZES = (1, 100, 10_000)
+
+
+def _buckets(n: int) -> List[BucketSummary]:
+    return [
+        BucketSummary(
+            name=f"bucket-{i:05d}",
+            object_count=i * 7,
+            total_size=i * 1_048_576,
+            type="ai_training" if i % 3 else "general_purpose",
+            access_policies=None,
+        )
+        for i in range(n)
+    ]
+
+
+def _before(buckets: List[BucketSummary]) -> bytes:
+    content = ADAPTER.dump_python(ADAPTER.validate_python(buckets), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _default(buckets: List[BucketSummary]) -> bytes:
+    content = ADAPTER.dump_python(ADAPTER.validate_python(buckets), mode="json")
+    return FastJSONResponse(content).body
+
+
+def _prevalidated(buckets: List[BucketSummary]) -> bytes:
+    return prevalidated(buckets, ADAPTER).body
+
+
+def main() -> None:
+    print(f"{'buckets':>8} {'before':>12} {'default':>12} {'prevalidated':>14} {'speedup':>8}")
+    for n in SIZES:
+        buckets = _buckets(n)
+        assert json.loads(_before(buckets)) == json.loads(_prevalidated(buckets))
+        number = max(5, 20_000 // n)
+        timings = [
+            min(timeit.repeat(lambda: fn(buckets), number=number, repeat=5)) / number * 1e6
+            for fn in (_before, _default, _prevalidated)
+        ]
+        print(
+            f"{n:>8} {timings[0]:>10.1f}us {timings[1]:>10.1f}us {timings[2]:>12.1f}us "
+            f"{timings[0] / timings[2]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
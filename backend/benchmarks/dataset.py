@@ -0,0 +1,161 @@
+"""
+Synthetic Console database at configurable scale, for repository benchmarks.
+
+The schema comes from the app's own migrations. Rows are bulk-loaded with stdlib sqlite3
+(no journal, no fsync, triggers dropped), then the migrations run again, which backfills
+daily_rollups and recreates the triggers, and the key change log is filled from api_keys.
+Data is deterministic for a given --seed:
+
+  users      user00000042@example.com; a third sign in with Google (google_id set)
+  api_keys   one per user for --key-ratio of users
+  buckets    "default" plus a geometric number of "bucket-N" per user, mean --buckets-per-user
+
+Run from backend/:
+    python -m benchmarks.dataset --users 1000000 --buckets-per-user 10 --out data/bench.db
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import string
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, Tuple
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+BATCH_ROWS = 100_000
+SPAN_DAYS = 3 * 365
+PASSWORD_HASH = "$2b$12$" + "x" * 53  # shape of a bcrypt hash; never verified
+ALPHABET = string.ascii_letters + string.digits
+
+
+def user_email(i: int) -> str:
+    return f"user{i:08d}@example.com"
+
+
+def google_id(i: int) -> str:
+    return f"g{i:012d}"
+
+
+def access_key(i: int) -> str:
+    return f"AK{i:018d}"
+
+
+async def _migrate(path: str) -> None:
+    from config import get_settings
+    from core import database
+
+    os.environ["DATABASE_PATH"] = path
+    get_settings.cache_clear()
+    await database.init_sqlite()
+    await database.close_sqlite()
+
+
+def _batched(rows: Iterator[tuple]) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _created_at(rng: random.Random, start: datetime) -> str:
+    return (start + timedelta(seconds=rng.randrange(SPAN_DAYS * 86400))).isoformat()
+
+
+def _users(n: int, seed: int, start: datetime) -> Iterator[tuple]:
+    rng = random.Random(seed)
+    for i in range(n):
+        created = _created_at(rng, start)
+        if i % 3 == 0:
+            yield user_email(i), google_id(i), f"User {i}", None, None, "google", created, created
+        else:
+            yield user_email(i), None, f"User {i}", None, PASSWORD_HASH, "email", created, created
+
+
+def _api_keys(n: int, ratio: float, seed: int, start: datetime) -> Iterator[tuple]:
+    rng = random.Random(seed + 1)
+    for i in range(n):
+        if rng.random() < ratio:
+            secret = "".join(rng.choices(ALPHABET, k=40))
+            yield access_key(i), user_email(i), secret, _created_at(rng, start), "active"
+
+
+def _buckets(n: int, per_user: float, seed: int, start: datetime) -> Iterator[tuple]:
+    rng = random.Random(seed + 2)
+    extra_p = 1 / per_user if per_user > 1 else 1.0
+    for i in range(n):
+        owner = user_email(i)
+        yield "default", owner, None, "general_purpose", _created_at(rng, start)
+        j = 0
+        while rng.random() >= extra_p:  # geometric: mean per_user buckets in total
+            kind = "ai_training" if j % 5 == 4 else "general_purpose"
+            yield f"bucket-{j}", owner, None, kind, _created_at(rng, start)
+            j += 1
+
+
+def generate(path: str, users: int, buckets_per_user: float, key_ratio: float, seed: int = 1) -> dict:
+    """Create `path` from scratch; returns row counts and timings."""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    started = time.perf_counter()
+    asyncio.run(_migrate(path))
+
+    start = datetime(2023, 1, 1)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    triggers = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    for name in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+
+    counts = {}
+    for table, sql, rows in (
+        ("users", "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _users(users, seed, start)),
+        ("api_keys", "INSERT INTO api_keys VALUES (?, ?, ?, ?, ?)", _api_keys(users, key_ratio, seed, start)),
+        ("buckets", "INSERT INTO buckets VALUES (?, ?, ?, ?, ?)", _buckets(users, buckets_per_user, seed, start)),
+    ):
+        table_started = time.perf_counter()
+        n = 0
+        for batch in _batched(rows):
+            conn.execute("BEGIN")
+            conn.executemany(sql, batch)
+            conn.execute("COMMIT")
+            n += len(batch)
+        counts[table] = n
+        print(f"  {table:<9} {n:>11,} rows in {time.perf_counter() - table_started:6.1f} s")
+    conn.execute(
+        "INSERT INTO api_key_changes (access_key, owner_id, event, created_at) "
+        "SELECT access_key, owner_id, 'created', created_at FROM api_keys ORDER BY created_at"
+    )
+    conn.close()
+
+    asyncio.run(_migrate(path))  # backfills daily_rollups, recreates the triggers
+    counts["seconds"] = round(time.perf_counter() - started, 1)
+    counts["bytes"] = os.path.getsize(path)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic Console database.")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--buckets-per-user", type=float, default=10.0)
+    parser.add_argument("--key-ratio", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="data/bench.db")
+    args = parser.parse_args()
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    print(f"Generating {args.out}: {args.users:,} users, ~{args.buckets_per_user:g} buckets/user")
+    result = generate(args.out, args.users, args.buckets_per_user, args.key_ratio, args.seed)
+    print(f"Done in {result['seconds']} s, {result['bytes'] / 1024 / 1024:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,118 @@
+import os
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Optional
+
+# Set by serve.py in each worker process; 0 when the app runs under plain uvicorn.
+WORKER_ID_ENV = "VITALITY_WORKER_ID"
 
 class Settings(BaseSettings):
     database_path: str = "./data/vitality.db"
+    # SQLite tuning: a named profile ("default" keeps SQLite's own defaults, "production"
+    # enables WAL, NORMAL sync, a larger cache and mmap); any sqlite_* value set overrides it.
+    sqlite_profile: str = "default"
+    sqlite_journal_mode: Optional[str] = None
+    sqlite_synchronous: Optional[str] = None
+    sqlite_cache_size: Optional[int] = None
+    sqlite_mmap_size: Optional[int] = None
+    sqlite_busy_timeout_ms: Optional[int] = None
+    sqlite_temp_store: Optional[str] = None
+    sqlite_auto_vacuum: Optional[str] = None
+    sqlite_maintenance_interval_seconds: float = 3600.0
+    sqlite_analyze_every_runs: int = 24
+    sqlite_incremental_vacuum_pages: int = 1000
+    # Online backups (core.backup): pages copied per step and pause between steps.
+    backup_dir: str = "./data/backups"
+    backup_step_pages: int = 256
+    backup_step_sleep_ms: float = 5.0
     secret_key: str
     google_client_id: Optional[str] = None
     google_client_secret: Optional[str] = None
     access_token_expire_minutes: int = 60
     warpdrive_service_secret: Optional[str] = None
+    # Unix socket for Warpdrive's credential lookups (core.credential_socket); unset = HTTP only.
+    credential_socket_path: Optional[str] = None
+    credential_socket_cache_seconds: float = 1.0
+    admin_emails: List[str] = []
+    # Where bucket stats come from: "warpdrive" (GET /s3 on demand) or "counters" (deltas pushed by
+    # Warpdrive to POST /api/buckets/usage/deltas, buffered and flushed in batches; services.usage_ingest).
+    storage_usage_source: str = "warpdrive"
+    usage_ingest_flush_seconds: float = 1.0
+    usage_ingest_flush_keys: int = 5000
+    usage_ingest_max_pending_keys: int = 200_000
+
+    # Password hashing cost: calibrated at startup so one hash takes at most BCRYPT_TARGET_MS,
+    # within [BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS]. BCRYPT_ROUNDS pins it instead. Stored hashes
+    # with a lower cost (any other cost, when pinned) are rehashed on the user's next login.
+    bcrypt_target_ms: float = 250.0
+    bcrypt_min_rounds: int = 10
+    bcrypt_max_rounds: int = 16
+    bcrypt_rounds: Optional[int] = None
+
+    # In-memory filter of issued access keys (services.key_filter); unknown keys skip the database.
+    # Keys created by other workers become visible within KEY_FILTER_SYNC_SECONDS.
+    key_filter_enabled: bool = True
+    key_filter_false_positive_rate: float = 0.01
+    key_filter_sync_seconds: float = 1.0
+
+    # How long Warpdrive may cache a credential bundle before revalidating it.
+    credentials_max_age_seconds: int = 300
+    # Long-poll limit for the key change feed; other workers' writes are noticed within the poll interval.
+    change_feed_max_wait_seconds: float = 30.0
+    change_feed_poll_seconds: float = 1.0
     warpdrive_url: Optional[str] = None
+    warpdrive_stats_ttl_seconds: float = 15.0
+    warpdrive_timeout_seconds: float = 10.0
+    warpdrive_max_workers: int = 16
+    warpdrive_breaker_failure_threshold: int = 5
+    warpdrive_breaker_reset_seconds: float = 30.0
+    # Default (and maximum) budget per request; callers may ask for less via X-Request-Timeout.
+    request_timeout_seconds: float = 15.0
+    # Serve the built frontend (e.g. ../frontend/build) from this app when set.
+    frontend_build_dir: Optional[str] = None
+    frontend_memory_cache_max_bytes: int = 256 * 1024
+    # Usage history retention per resolution tier (raw samples are one per minute at most).
+    usage_raw_retention_hours: int = 48
+    usage_hourly_retention_days: int = 90
+    usage_daily_retention_days: int = 1825
+    usage_report_concurrency: int = 8
+    usage_report_retries: int = 2
+
+    # Admission control: per-route-group token buckets ("<requests>/<seconds>") and a
+    # global in-flight limit, part of which is reserved for Warpdrive service calls.
+    rate_limit_enabled: bool = True
+    rate_limits: Dict[str, str] = {
+        "login": "10/60",
+        "credentials": "60/60",
+        "default": "300/60",
+    }
+    max_concurrent_requests: int = 256
+    warpdrive_reserved_concurrency: int = 64
+
+    # Per-request profiling: requests sending `X-Profile: <profiling_token>` are sampled
+    # and kept for GET /api/admin/profiles. Disabled means the middleware is not installed.
+    profiling_enabled: bool = False
+    profiling_token: Optional[str] = None
+    profiling_interval_ms: float = 2.0
+    profiling_max_profiles: int = 20
+    # Shared by all serve.py workers, so any of them can return any profile.
+    profiling_dir: str = "./data/profiles"
+
+    # Event-loop lag monitor (GET /api/admin/loop); debug adds stack capture of blocking calls.
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: float = 100.0
+    loop_block_threshold_ms: float = 100.0
+    loop_monitor_debug: bool = False
+
+    # Production server (python serve.py). 0 workers = one per CPU. Keep-alive should stay
+    # below the idle timeout of any load balancer in front.
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 0
+    server_backlog: int = 2048
+    server_keepalive_seconds: float = 15.0
+    server_graceful_timeout_seconds: float = 30.0
+    server_access_log: bool = False
 
     class Config:
         env_file = ".env"
@@ -18,3 +121,8 @@ class Settings(BaseSettings):
 @lru_cache()
 def get_settings() -> Settings:
     return Settings()
+
+
+def worker_id() -> int:
+    """This process's worker number; host-wide singletons (maintenance, credential socket) run in worker 0."""
+    return int(os.environ.get(WORKER_ID_ENV, "0"))
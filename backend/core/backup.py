@@ -0,0 +1,198 @@
+"""
+Online backup and restore of the Console database via the SQLite backup API.
+
+The backup copies BACKUP_STEP_PAGES pages per step on its own sqlite3 connection in a
+worker thread, sleeping BACKUP_STEP_SLEEP_MS between steps, so the aiosqlite connection
+serving requests is never blocked. SQLite restarts a stepwise backup when another
+connection writes to the source; after MAX_RESTARTS restarts, a WAL database is copied
+in a single step instead (which only holds a read snapshot, so writers carry on). In
+rollback-journal mode a single step would lock writers out for the whole copy, so the
+backup fails with BackupBusy and can be retried at a quieter time. A failed backup
+leaves no files behind. File names carry the process id as well as the time, since
+run_backup's lock only serializes backups within one process (one serve.py worker).
+
+CLI (from backend/):
+    python -m core.backup backup [--dest DIR] [--compress]
+    python -m core.backup restore FILE [--db PATH]     # stop the service first
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from config import Settings
+
+MAX_RESTARTS = 3
+
+_lock: Optional[asyncio.Lock] = None
+
+
+class BackupResult(BaseModel):
+    path: str
+    pages: int
+    page_size: int
+    bytes_written: int
+    seconds: float
+    mb_per_second: float
+    restarts: int
+    compressed: bool
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+class BackupBusy(Exception):
+    """The database kept changing under a stepwise backup and is not in WAL mode."""
+
+
+def _copy(source: sqlite3.Connection, target: sqlite3.Connection, pages: int, sleep: float) -> int:
+    restarts = 0
+    last_remaining = None
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    except _TooManyRestarts:
+        journal_mode = source.execute("PRAGMA journal_mode").fetchone()[0]
+        if journal_mode.lower() != "wal":
+            raise BackupBusy(
+                f"restarted {restarts} times by concurrent writes; retry later or use WAL (SQLITE_PROFILE=production)"
+            )
+        source.backup(target, pages=-1)
+    return restarts
+
+
+def backup_database(
+    db_path: str,
+    dest_dir: str,
+    pages: int = 256,
+    step_sleep: float = 0.005,
+    compress: bool = False,
+) -> BackupResult:
+    """Blocking; run it in a worker thread from async code."""
+    os.makedirs(dest_dir, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    dest = os.path.join(dest_dir, f"vitality-{stamp}-{os.getpid()}.db")
+    tmp = dest + ".partial"
+    packed_tmp = dest + ".gz.partial"
+    started = time.perf_counter()
+    try:
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(tmp)
+        try:
+            restarts = _copy(source, target, pages, step_sleep)
+            page_size = target.execute("PRAGMA page_size").fetchone()[0]
+            page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            target.close()
+            source.close()
+        if compress:
+            with open(tmp, "rb") as raw, gzip.open(packed_tmp, "wb", compresslevel=6) as packed:
+                shutil.copyfileobj(raw, packed, 1024 * 1024)
+            dest += ".gz"
+            os.replace(packed_tmp, dest)
+        else:
+            os.replace(tmp, dest)
+    finally:
+        for leftover in (tmp, packed_tmp):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    seconds = time.perf_counter() - started
+    size = page_size * page_count
+    return BackupResult(
+        path=dest,
+        pages=page_count,
+        page_size=page_size,
+        bytes_written=os.path.getsize(dest),
+        seconds=round(seconds, 3),
+        mb_per_second=round(size / (1024 * 1024) / seconds, 2) if seconds else 0.0,
+        restarts=restarts,
+        compressed=compress,
+    )
+
+
+async def run_backup(compress: bool = False, settings: Optional[Settings] = None) -> BackupResult:
+    """Back up the configured database without blocking the event loop; one backup at a time."""
+    global _lock
+    settings = settings or Settings()
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        return await asyncio.to_thread(
+            backup_database,
+            settings.database_path,
+            settings.backup_dir,
+            settings.backup_step_pages,
+            settings.backup_step_sleep_ms / 1000,
+            compress,
+        )
+
+
+def restore_database(backup_path: str, db_path: str) -> None:
+    """Replace db_path's contents with a (possibly .gz) backup after an integrity check."""
+    with tempfile.TemporaryDirectory() as work:
+        source_path = backup_path
+        if backup_path.endswith(".gz"):
+            source_path = os.path.join(work, "restore.db")
+            with gzip.open(backup_path, "rb") as packed, open(source_path, "wb") as raw:
+                shutil.copyfileobj(packed, raw, 1024 * 1024)
+        source = sqlite3.connect(source_path)
+        try:
+            result = source.execute("PRAGMA integrity_check").fetchone()[0]
+            if result != "ok":
+                raise RuntimeError(f"Backup failed integrity check: {result}")
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            target = sqlite3.connect(db_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Back up or restore the Vitality Console database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("backup")
+    b.add_argument("--dest", help="directory for the backup (default: BACKUP_DIR)")
+    b.add_argument("--compress", action="store_true", help="gzip the backup")
+    r = sub.add_parser("restore")
+    r.add_argument("file")
+    r.add_argument("--db", help="database to overwrite (default: DATABASE_PATH)")
+    args = parser.parse_args()
+
+    settings = Settings()
+    if args.command == "backup":
+        result = backup_database(
+            settings.database_path,
+            args.dest or settings.backup_dir,
+            settings.backup_step_pages,
+            settings.backup_step_sleep_ms / 1000,
+            args.compress,
+        )
+        print(result.model_dump_json(indent=2))
+    else:
+        db_path = args.db or settings.database_path
+        restore_database(args.file, db_path)
+        print(f"Restored {args.file} into {db_path}")
+
+
+if __name__ == "__main__":
+    main()
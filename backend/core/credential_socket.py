@@ -0,0 +1,382 @@
+"""
+Credential lookups for a co-located Warpdrive over a Unix domain socket (CREDENTIAL_SOCKET_PATH).
+
+Serves the same lookups as POST /api/auth/s3-credentials (services.credentials) without
+HTTP, JSON or FastAPI in the way. Every frame is a 4-byte big-endian length followed by
+the payload; integers are big-endian and strings UTF-8.
+
+    request   op:u8  id:u32  body
+      AUTH    (1)    secret bytes                        must be the first frame
+      LOOKUP  (2)    version_len:u8 version  access_key  version may be empty
+
+    response  status:u8  id:u32  body
+      OK            (0)  version_len:u8 version  max_age:u32
+                         owner_len:u16 owner_id  secret_len:u16 secret_key
+                         bucket_count:u16 (name_len:u8 name  type_len:u8 type)*
+      NOT_MODIFIED  (1)  version                     the sent version is current
+      NOT_FOUND     (2)  -                           unknown or inactive key (HTTP 401)
+      NO_SECRET     (3)  -                           key has no stored secret (HTTP 400)
+      UNAUTHORIZED  (4)  -                           bad or missing AUTH; connection closes
+      BAD_REQUEST   (5)  message
+      ERROR         (6)  message
+      TOO_LARGE     (7)  -                           bundle exceeds MAX_FRAME_BYTES; use HTTP
+
+Frames are at most MAX_FRAME_BYTES in either direction. A bundle that would not fit (an
+owner with very many buckets) is answered with TOO_LARGE, and Warpdrive fetches it from
+POST /api/auth/s3-credentials instead.
+
+The connection is authenticated once with the Warpdrive service secret. Requests may be
+pipelined: they are answered in order, and responses produced in the same pass of the
+event loop (pipelined requests that were already buffered and needed no database round
+trip) go out in one write. Lookup results are reused for
+CREDENTIAL_SOCKET_CACHE_SECONDS (see _ResolvedCache), so hot keys cost no database
+round trips. `CredentialSocketClient` is a reference client.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import stat
+import struct
+import time
+from itertools import count
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import get_settings
+from services.credentials import (
+    BundleBucket,
+    CredentialBundle,
+    MissingSecret,
+    build_bundle,
+    bundle_version,
+    get_active_key,
+)
+from services.change_feed import key_change_notifier
+
+logger = logging.getLogger(__name__)
+
+OP_AUTH = 1
+OP_LOOKUP = 2
+
+OK = 0
+NOT_MODIFIED = 1
+NOT_FOUND = 2
+NO_SECRET = 3
+UNAUTHORIZED = 4
+BAD_REQUEST = 5
+ERROR = 6
+TOO_LARGE = 7
+
+MAX_FRAME_BYTES = 64 * 1024
+
+_LEN = struct.Struct(">I")
+_HEADER = struct.Struct(">BI")  # op/status, request id
+_U8 = struct.Struct(">B")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+
+_server: Optional[asyncio.AbstractServer] = None
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class BundleTooLarge(Exception):
+    """The bundle does not fit in one frame."""
+
+
+def _frame(code: int, request_id: int, body: bytes = b"") -> bytes:
+    return _LEN.pack(_HEADER.size + len(body)) + _HEADER.pack(code, request_id) + body
+
+
+def _short(value: str, size: struct.Struct) -> bytes:
+    data = value.encode("utf-8")
+    return size.pack(len(data)) + data
+
+
+def encode_bundle(bundle: CredentialBundle) -> bytes:
+    """Raises BundleTooLarge if the encoded bundle would not fit in an OK frame."""
+    if len(bundle.buckets) > 0xFFFF:
+        raise BundleTooLarge(f"{len(bundle.buckets)} buckets")
+    parts = [
+        _short(bundle.version, _U8),
+        _U32.pack(bundle.max_age),
+        _short(bundle.owner_id, _U16),
+        _short(bundle.secret_key, _U16),
+        _U16.pack(len(bundle.buckets)),
+    ]
+    for bucket in bundle.buckets:
+        parts.append(_short(bucket.name, _U8))
+        parts.append(_short(bucket.type, _U8))
+    body = b"".join(parts)
+    if _HEADER.size + len(body) > MAX_FRAME_BYTES:
+        raise BundleTooLarge(f"{len(body)} bytes")
+    return body
+
+
+def decode_bundle(body: bytes) -> CredentialBundle:
+    pos = 0
+
+    def take(size: struct.Struct) -> str:
+        nonlocal pos
+        (n,) = size.unpack_from(body, pos)
+        pos += size.size
+        value = body[pos:pos + n].decode("utf-8")
+        pos += n
+        return value
+
+    version = take(_U8)
+    (max_age,) = _U32.unpack_from(body, pos)
+    pos += _U32.size
+    owner_id = take(_U16)
+    secret_key = take(_U16)
+    (n_buckets,) = _U16.unpack_from(body, pos)
+    pos += _U16.size
+    buckets = [BundleBucket(name=take(_U8), type=take(_U8)) for _ in range(n_buckets)]
+    return CredentialBundle(owner_id=owner_id, secret_key=secret_key, version=version, max_age=max_age, buckets=buckets)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Optional[Tuple[int, int, bytes]]:
+    try:
+        header = await reader.readexactly(_LEN.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ProtocolError("truncated frame") from e
+        return None  # clean EOF
+    (length,) = _LEN.unpack(header)
+    if length < _HEADER.size or length > MAX_FRAME_BYTES:
+        raise ProtocolError(f"bad frame length {length}")
+    payload = await reader.readexactly(length)
+    code, request_id = _HEADER.unpack_from(payload)
+    return code, request_id, payload[_HEADER.size:]
+
+
+class _Resolved(NamedTuple):
+    expires_at: float
+    generation: int
+    status: int
+    version: str
+    body: bytes
+
+
+class _ResolvedCache:
+    """
+    Lookup results for CREDENTIAL_SOCKET_CACHE_SECONDS. Local key changes (key_change_notifier)
+    invalidate everything at once; other changes (new buckets, other workers' key changes)
+    show up within the TTL, far inside the max_age Warpdrive may cache bundles for anyway.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, _Resolved] = {}
+
+    def get(self, access_key: str) -> Optional[_Resolved]:
+        entry = self._entries.get(access_key)
+        if entry is None or entry.expires_at < time.monotonic() or entry.generation != key_change_notifier.generation:
+            return None
+        return entry
+
+    def put(self, access_key: str, generation: int, status: int, version: str = "", body: bytes = b"") -> _Resolved:
+        entry = _Resolved(time.monotonic() + self.ttl, generation, status, version, body)
+        if self.ttl > 0:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[access_key] = entry
+        return entry
+
+
+async def _resolve(access_key: str, cache: _ResolvedCache) -> _Resolved:
+    entry = cache.get(access_key)
+    if entry is not None:
+        return entry
+    generation = key_change_notifier.generation
+    try:
+        key_row = await get_active_key(access_key)
+    except MissingSecret:
+        return cache.put(access_key, generation, NO_SECRET)
+    if not key_row:
+        return cache.put(access_key, generation, NOT_FOUND)
+    version = await bundle_version(key_row)
+    bundle = await build_bundle(key_row, version)
+    try:
+        body = encode_bundle(bundle)
+    except BundleTooLarge as e:
+        logger.warning("Credential socket: bundle for %s too large for a frame (%s)", bundle.owner_id, e)
+        return cache.put(access_key, generation, TOO_LARGE)
+    return cache.put(access_key, generation, OK, version, body)
+
+
+async def _lookup(request_id: int, body: bytes, cache: _ResolvedCache) -> bytes:
+    if not body:
+        return _frame(BAD_REQUEST, request_id, b"empty lookup")
+    version_len = body[0]
+    known_version = body[1:1 + version_len].decode("ascii", "replace")
+    access_key = body[1 + version_len:].decode("utf-8", "replace")
+    if not access_key:
+        return _frame(BAD_REQUEST, request_id, b"missing access_key")
+    resolved = await _resolve(access_key, cache)
+    if resolved.status == OK and known_version and hmac.compare_digest(known_version, resolved.version):
+        return _frame(NOT_MODIFIED, request_id, resolved.version.encode("ascii"))
+    return _frame(resolved.status, request_id, resolved.body)
+
+
+class _Batcher:
+    """Coalesces the responses queued during one event-loop pass into a single write."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self._writer = writer
+        self._frames: List[bytes] = []
+        self._scheduled = False
+
+    def send(self, frame: bytes) -> None:
+        self._frames.append(frame)
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self) -> None:
+        self._scheduled = False
+        if self._frames and not self._writer.is_closing():
+            self._writer.write(b"".join(self._frames))
+        self._frames.clear()
+
+
+async def _handle(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, secret: bytes, cache: _ResolvedCache
+) -> None:
+    try:
+        first = await _read_frame(reader)
+        if first is None:
+            return
+        op, request_id, body = first
+        if op != OP_AUTH or not hmac.compare_digest(body, secret):
+            logger.warning("Credential socket: rejected connection (bad or missing AUTH)")
+            writer.write(_frame(UNAUTHORIZED, request_id))
+            await writer.drain()
+            return
+        writer.write(_frame(OK, request_id))
+        await writer.drain()
+        batcher = _Batcher(writer)
+        while True:
+            frame = await _read_frame(reader)
+            if frame is None:
+                batcher.flush()  # answer what was read before the client half-closed
+                return
+            op, request_id, body = frame
+            if op == OP_LOOKUP:
+                try:
+                    batcher.send(await _lookup(request_id, body, cache))
+                except Exception as e:
+                    logger.exception("Credential socket: lookup failed")
+                    batcher.send(_frame(ERROR, request_id, str(e).encode("utf-8")[:1024]))
+            else:
+                batcher.send(_frame(BAD_REQUEST, request_id, f"unknown op {op}".encode("utf-8")))
+            # Reading a frame that is already buffered does not yield, so the batch is only
+            # flushed once the client has nothing more pipelined (or a lookup waits on the
+            # database). This waits only if earlier batches still fill the socket buffer.
+            await writer.drain()
+    except ProtocolError as e:
+        logger.warning("Credential socket: closing connection: %s", e)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_credential_socket() -> None:
+    global _server
+    settings = get_settings()
+    path = settings.credential_socket_path
+    if not path or _server is not None:
+        return
+    if not settings.warpdrive_service_secret:
+        logger.warning("Credential socket: WARPDRIVE_SERVICE_SECRET not set, not listening on %s", path)
+        return
+    secret = settings.warpdrive_service_secret.encode("utf-8")
+    cache = _ResolvedCache(settings.credential_socket_cache_seconds)
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(mode):
+            logger.error("Credential socket: %s exists and is not a socket, not listening", path)
+            return
+        os.unlink(path)  # stale socket from a previous run
+    # Created owner/group read-write from the start, so there is no window in which other
+    # users could connect before a chmod.
+    umask = os.umask(0o117)
+    try:
+        _server = await asyncio.start_unix_server(lambda r, w: _handle(r, w, secret, cache), path=path)
+    finally:
+        os.umask(umask)
+    logger.info("Credential socket listening on %s", path)
+
+
+async def stop_credential_socket() -> None:
+    global _server
+    if _server is None:
+        return
+    _server.close()
+    await _server.wait_closed()
+    path = get_settings().credential_socket_path
+    if path and os.path.exists(path):
+        os.unlink(path)
+    _server = None
+
+
+class CredentialSocketClient:
+    """Pipelining asyncio client, for tooling, tests and benchmarks."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._ids = count(1)
+
+    @classmethod
+    async def connect(cls, path: str, secret: str) -> "CredentialSocketClient":
+        reader, writer = await asyncio.open_unix_connection(path)
+        client = cls(reader, writer)
+        writer.write(_frame(OP_AUTH, 0, secret.encode("utf-8")))
+        status, _, _ = await client._read()
+        if status != OK:
+            writer.close()
+            raise PermissionError("credential socket rejected the service secret")
+        return client
+
+    async def _read(self) -> Tuple[int, int, bytes]:
+        frame = await _read_frame(self._reader)
+        if frame is None:
+            raise ConnectionError("credential socket closed")
+        return frame
+
+    def _request(self, access_key: str, version: Optional[str]) -> Tuple[int, bytes]:
+        request_id = next(self._ids)
+        version_bytes = (version or "").encode("ascii")
+        body = _U8.pack(len(version_bytes)) + version_bytes + access_key.encode("utf-8")
+        return request_id, _frame(OP_LOOKUP, request_id, body)
+
+    async def lookup_many(
+        self, requests: List[Tuple[str, Optional[str]]]
+    ) -> List[Tuple[int, Optional[CredentialBundle]]]:
+        """Pipeline (access_key, known_version) lookups; returns (status, bundle if OK) in order."""
+        ids = []
+        for access_key, version in requests:
+            request_id, frame = self._request(access_key, version)
+            ids.append(request_id)
+            self._writer.write(frame)
+        await self._writer.drain()
+        by_id: Dict[int, Tuple[int, Optional[CredentialBundle]]] = {}
+        for _ in ids:
+            status, request_id, body = await self._read()
+            by_id[request_id] = (status, decode_bundle(body) if status == OK else None)
+        return [by_id[i] for i in ids]
+
+    async def lookup(self, access_key: str, version: Optional[str] = None) -> Tuple[int, Optional[CredentialBundle]]:
+        return (await self.lookup_many([(access_key, version)]))[0]
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
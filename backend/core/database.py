@@ -1,28 +1,130 @@
 import aiosqlite
 import os
-from typing import Optional
+from typing import Dict, Optional, Union
 from config import Settings
-from repositories import SQLiteUserRepository, SQLiteApiKeyRepository, SQLiteBucketRepository
-from repositories.interfaces import UserRepository, ApiKeyRepository, BucketRepository
+from repositories import (
+    SQLiteUserRepository,
+    SQLiteApiKeyRepository,
+    SQLiteBucketRepository,
+    SQLiteAnalyticsRepository,
+    SQLiteUsageHistoryRepository,
+    SQLiteBucketCounterRepository,
+)
+from repositories.interfaces import (
+    UserRepository,
+    ApiKeyRepository,
+    BucketRepository,
+    AnalyticsRepository,
+    UsageHistoryRepository,
+    BucketCounterRepository,
+)
 
 _conn: Optional[aiosqlite.Connection] = None
 _user_repo: Optional[UserRepository] = None
 _api_key_repo: Optional[ApiKeyRepository] = None
 _bucket_repo: Optional[BucketRepository] = None
+_analytics_repo: Optional[AnalyticsRepository] = None
+_usage_history_repo: Optional[UsageHistoryRepository] = None
+_bucket_counter_repo: Optional[BucketCounterRepository] = None
+
+
+SQLITE_PROFILES: Dict[str, Dict[str, Union[str, int]]] = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,  # negative = KiB, i.e. 64 MiB
+        "mmap_size": 268435456,  # 256 MiB
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+        "auto_vacuum": "INCREMENTAL",  # only takes effect on a new database file
+    },
+}
+
+# Allowed values for the string pragmas; integers are formatted as ints.
+PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+    "auto_vacuum": {"NONE", "FULL", "INCREMENTAL"},
+}
+
+
+def sqlite_pragmas(settings: Settings) -> Dict[str, Union[str, int]]:
+    if settings.sqlite_profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown sqlite_profile {settings.sqlite_profile!r}; use one of {', '.join(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[settings.sqlite_profile])
+    overrides = {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "mmap_size": settings.sqlite_mmap_size,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "temp_store": settings.sqlite_temp_store,
+        "auto_vacuum": settings.sqlite_auto_vacuum,
+    }
+    pragmas.update({k: v for k, v in overrides.items() if v is not None})
+    for name, value in pragmas.items():
+        if name in PRAGMA_CHOICES:
+            value = str(value).upper()
+            if value not in PRAGMA_CHOICES[name]:
+                raise ValueError(f"Invalid value {value!r} for PRAGMA {name}")
+            pragmas[name] = value
+        else:
+            pragmas[name] = int(value)
+    return pragmas
+
+
+async def apply_pragmas(conn: aiosqlite.Connection, pragmas: Dict[str, Union[str, int]]) -> None:
+    # auto_vacuum must precede table creation, and journal_mode=WAL persists in the file.
+    for name in sorted(pragmas, key=lambda n: n != "auto_vacuum"):
+        await conn.execute(f"PRAGMA {name} = {pragmas[name]}")
+
+
+# metric -> (source table, dimension expression)
+ROLLUP_SOURCES = {
+    "signups": ("users", "COALESCE({row}auth_provider, '')"),
+    "keys_issued": ("api_keys", "''"),
+    "buckets_created": ("buckets", "COALESCE({row}type, '')"),
+}
+
+# Statement lists (not scripts), so they can run inside one explicit transaction.
+ROLLUP_BACKFILL = [
+    f"INSERT INTO daily_rollups (day, metric, dimension, count) "
+    f"SELECT substr(created_at, 1, 10), '{metric}', {dim.format(row='')}, COUNT(*) "
+    f"FROM {table} GROUP BY 1, 3 "
+    f"ON CONFLICT (day, metric, dimension) DO NOTHING"
+    for metric, (table, dim) in ROLLUP_SOURCES.items()
+]
+
+ROLLUP_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO daily_rollups (day, metric, dimension, count)
+        VALUES (substr(NEW.created_at, 1, 10), '{metric}', {dim.format(row='NEW.')}, 1)
+        ON CONFLICT (day, metric, dimension) DO UPDATE SET count = count + 1;
+    END"""
+    for metric, (table, dim) in ROLLUP_SOURCES.items()
+]
 
 
 async def init_sqlite() -> None:
-    global _conn, _user_repo, _api_key_repo, _bucket_repo
+    global _conn, _user_repo, _api_key_repo, _bucket_repo, _analytics_repo, _usage_history_repo, _bucket_counter_repo
     settings = Settings()
     path = settings.database_path
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
     _conn = await aiosqlite.connect(path)
     _conn.row_factory = aiosqlite.Row
+    pragmas = sqlite_pragmas(settings)
+    await apply_pragmas(_conn, pragmas)
     await _run_migrations()
     _user_repo = SQLiteUserRepository(_conn)
     _api_key_repo = SQLiteApiKeyRepository(_conn)
     _bucket_repo = SQLiteBucketRepository(_conn)
-    print("SQLite connected")
+    _analytics_repo = SQLiteAnalyticsRepository(_conn)
+    _usage_history_repo = SQLiteUsageHistoryRepository(_conn)
+    _bucket_counter_repo = SQLiteBucketCounterRepository(_conn)
+    print(f"SQLite connected ({settings.sqlite_profile} profile: {pragmas or 'SQLite defaults'})")
 
 async def _run_migrations() -> None:
     assert _conn is not None
@@ -45,6 +147,7 @@ async def _run_migrations() -> None:
             status TEXT NOT NULL DEFAULT 'active',
             FOREIGN KEY (owner_id) REFERENCES users(email)
         );
+        CREATE INDEX IF NOT EXISTS idx_api_keys_owner ON api_keys(owner_id);
         CREATE TABLE IF NOT EXISTS buckets (
             bucket_name TEXT NOT NULL,
             owner_id TEXT NOT NULL,
@@ -54,19 +157,95 @@ async def _run_migrations() -> None:
             UNIQUE(owner_id, bucket_name),
             FOREIGN KEY (owner_id) REFERENCES users(email)
         );
+        -- Append-only log of key creation/deletion, consumed by Warpdrive via the change feed.
+        CREATE TABLE IF NOT EXISTS api_key_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            access_key TEXT NOT NULL,
+            owner_id TEXT NOT NULL,
+            event TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS api_keys_log_insert AFTER INSERT ON api_keys
+        BEGIN
+            INSERT INTO api_key_changes (access_key, owner_id, event, created_at)
+            VALUES (NEW.access_key, NEW.owner_id, 'created', strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+        END;
+        CREATE TRIGGER IF NOT EXISTS api_keys_log_delete AFTER DELETE ON api_keys
+        BEGIN
+            INSERT INTO api_key_changes (access_key, owner_id, event, created_at)
+            VALUES (OLD.access_key, OLD.owner_id, 'deleted', strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+        END;
+        -- Per-day counters maintained by triggers so admin analytics never scan the base tables.
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            day TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            dimension TEXT NOT NULL DEFAULT '',
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, metric, dimension)
+        ) WITHOUT ROWID;
+        -- Storage usage snapshots per owner and bucket ('' = owner total) at raw/hour/day resolution.
+        CREATE TABLE IF NOT EXISTS usage_samples (
+            owner_id TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            bucket_name TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            object_count INTEGER NOT NULL,
+            total_size INTEGER NOT NULL,
+            PRIMARY KEY (owner_id, resolution, bucket_name, ts)
+        ) WITHOUT ROWID;
+        -- Object/byte counters per bucket, summed from the deltas Warpdrive pushes (services.usage_ingest).
+        CREATE TABLE IF NOT EXISTS bucket_counters (
+            owner_id TEXT NOT NULL,
+            bucket_name TEXT NOT NULL,
+            object_count INTEGER NOT NULL,
+            total_size INTEGER NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (owner_id, bucket_name)
+        ) WITHOUT ROWID;
     """)
-    await _conn.commit()
+    # The emptiness check, backfill and triggers form one write transaction: a second
+    # process migrating concurrently waits, then finds the rollups filled and the triggers
+    # in place, and no row is inserted between the backfill and the triggers.
+    await _conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = await _conn.execute("SELECT 1 FROM daily_rollups LIMIT 1")
+        rollups_empty = await cursor.fetchone() is None
+        await cursor.close()
+        if rollups_empty:
+            # First run with rollups: backfill from existing rows before the triggers exist.
+            for statement in ROLLUP_BACKFILL:
+                await _conn.execute(statement)
+        for statement in ROLLUP_TRIGGERS:
+            await _conn.execute(statement)
+        await _conn.commit()
+    except BaseException:
+        await _conn.rollback()
+        raise
 
 async def close_sqlite() -> None:
-    global _conn, _user_repo, _api_key_repo, _bucket_repo
+    global _conn, _user_repo, _api_key_repo, _bucket_repo, _analytics_repo, _usage_history_repo, _bucket_counter_repo
     if _conn:
         await _conn.close()
         _conn = None
     _user_repo = None
     _api_key_repo = None
     _bucket_repo = None
+    _analytics_repo = None
+    _usage_history_repo = None
+    _bucket_counter_repo = None
     print("SQLite connection closed")
 
+async def optimize() -> None:
+    """
+    PRAGMA optimize on the app connection. Before SQLite 3.46 it only considers tables the
+    connection itself has queried, so it must run here rather than on a fresh connection;
+    analysis_limit keeps any ANALYZE it triggers short enough not to stall requests.
+    """
+    if _conn is None:
+        return
+    await _conn.execute("PRAGMA analysis_limit = 1000")
+    await _conn.execute("PRAGMA optimize")
+
 def get_user_repo() -> UserRepository:
     if _user_repo is None:
         raise RuntimeError("SQLite not initialized; call init_sqlite() first")
@@ -82,3 +261,21 @@ def get_bucket_repo() -> BucketRepository:
     if _bucket_repo is None:
         raise RuntimeError("SQLite not initialized; call init_sqlite() first")
     return _bucket_repo
+
+
+def get_analytics_repo() -> AnalyticsRepository:
+    if _analytics_repo is None:
+        raise RuntimeError("SQLite not initialized; call init_sqlite() first")
+    return _analytics_repo
+
+
+def get_usage_history_repo() -> UsageHistoryRepository:
+    if _usage_history_repo is None:
+        raise RuntimeError("SQLite not initialized; call init_sqlite() first")
+    return _usage_history_repo
+
+
+def get_bucket_counter_repo() -> BucketCounterRepository:
+    if _bucket_counter_repo is None:
+        raise RuntimeError("SQLite not initialized; call init_sqlite() first")
+    return _bucket_counter_repo
@@ -0,0 +1,64 @@
+"""
+Per-request deadlines. The middleware derives a deadline from the caller's budget
+(X-Request-Timeout, seconds) capped by REQUEST_TIMEOUT_SECONDS; downstream calls such as
+Warpdrive use `remaining()` so they never outlive the request that triggered them.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import get_settings
+
+REQUEST_TIMEOUT_HEADER = b"x-request-timeout"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None outside a request."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def unbounded() -> Iterator[None]:
+    """Run background work started from a request without inheriting its deadline."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _budget(scope: Scope) -> float:
+    budget = get_settings().request_timeout_seconds
+    for name, value in scope.get("headers", ()):
+        if name == REQUEST_TIMEOUT_HEADER:
+            try:
+                requested = float(value)
+            except ValueError:
+                break
+            if requested > 0:
+                budget = min(budget, requested)
+            break
+    return budget
+
+
+class DeadlineMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _deadline.set(time.monotonic() + _budget(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
@@ -0,0 +1,31 @@
+"""Strong ETags and If-None-Match handling for cheap conditional GETs."""
+import hashlib
+
+from fastapi import Request, Response
+
+# Dashboards must revalidate every time, but only within the user's own cache.
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts: object) -> str:
+    digest = hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (c.strip() for c in header.split(","))
+    return any(c == etag or c == f"W/{etag}" for c in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_REVALIDATE
@@ -0,0 +1,181 @@
+"""
+Event-loop lag monitor (LOOP_MONITOR_ENABLED).
+
+A task sleeps LOOP_MONITOR_INTERVAL_MS at a time and records how late it wakes up: that
+delay is time the loop spent running something else without yielding. Lag percentiles,
+a histogram and the number of stalls over LOOP_BLOCK_THRESHOLD_MS are served from
+GET /api/admin/loop.
+
+With LOOP_MONITOR_DEBUG, a watchdog thread also notices when the loop has not woken the
+monitor for longer than the threshold and captures the loop thread's stack *while it is
+blocked*, i.e. the blocking call itself (bcrypt, a synchronous HTTP call, ...). Captured
+stacks are logged and kept for the admin endpoint.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_BOUNDS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+WINDOW_SAMPLES = 600
+MAX_BLOCKING_EVENTS = 50
+
+
+class BlockingEvent(BaseModel):
+    detected_at: datetime
+    blocked_ms: float
+    stack: List[str]
+
+
+class LoopLagStats(BaseModel):
+    interval_ms: float
+    threshold_ms: float
+    samples: int
+    lag_ms_last: float
+    lag_ms_p50: float
+    lag_ms_p99: float
+    lag_ms_max: float
+    stalls: int
+    histogram: Dict[str, int]
+    blocking_events: List[BlockingEvent]
+
+
+class LoopMonitor:
+    def __init__(self, interval: float, threshold: float, debug: bool = False):
+        self.interval = interval
+        self.threshold = threshold
+        self.debug = debug
+        self.samples = 0
+        self.stalls = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.window: Deque[float] = deque(maxlen=WINDOW_SAMPLES)
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.blocking_events: Deque[BlockingEvent] = deque(maxlen=MAX_BLOCKING_EVENTS)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def record(self, lag: float) -> None:
+        lag_ms = lag * 1000
+        self.samples += 1
+        self.last_lag = lag_ms
+        self.max_lag = max(self.max_lag, lag_ms)
+        self.window.append(lag_ms)
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if lag_ms <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+        if lag >= self.threshold:
+            self.stalls += 1
+            logger.warning("Event loop blocked for %.0f ms", lag_ms)
+
+    async def _tick(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.record(max(0.0, now - expected))
+
+    def _watch(self) -> None:
+        captured_for = None
+        while not self._stopping.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.threshold or captured_for == heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            captured_for = heartbeat
+            stack = traceback.format_stack(frame)
+            self.blocking_events.append(BlockingEvent(
+                detected_at=datetime.utcnow(), blocked_ms=round(blocked * 1000, 1), stack=stack,
+            ))
+            logger.warning("Event loop blocked for over %.0f ms in:\n%s", blocked * 1000, "".join(stack))
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._tick())
+        if self.debug:
+            self._stopping.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> LoopLagStats:
+        window = sorted(self.window)
+
+        def pct(p: float) -> float:
+            return round(window[min(len(window) - 1, int(len(window) * p))], 3) if window else 0.0
+
+        labels = [f"le_{b}ms" for b in HISTOGRAM_BOUNDS_MS] + [f"gt_{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return LoopLagStats(
+            interval_ms=self.interval * 1000,
+            threshold_ms=self.threshold * 1000,
+            samples=self.samples,
+            lag_ms_last=round(self.last_lag, 3),
+            lag_ms_p50=pct(0.5),
+            lag_ms_p99=pct(0.99),
+            lag_ms_max=round(self.max_lag, 3),
+            stalls=self.stalls,
+            histogram=dict(zip(labels, self.histogram)),
+            blocking_events=list(self.blocking_events),
+        )
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> Optional[LoopMonitor]:
+    return _monitor
+
+
+def start_loop_monitor() -> None:
+    global _monitor
+    settings = get_settings()
+    if not settings.loop_monitor_enabled or _monitor is not None:
+        return
+    _monitor = LoopMonitor(
+        settings.loop_monitor_interval_ms / 1000,
+        settings.loop_block_threshold_ms / 1000,
+        debug=settings.loop_monitor_debug,
+    )
+    _monitor.start()
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+    if _monitor is None:
+        return
+    await _monitor.stop()
+    _monitor = None
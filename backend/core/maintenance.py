@@ -0,0 +1,96 @@
+"""
+Background SQLite maintenance, every SQLITE_MAINTENANCE_INTERVAL_SECONDS (0 disables).
+
+Each run: PRAGMA optimize (on the app connection), a PASSIVE WAL checkpoint (never waits on readers or writers),
+an incremental vacuum step when auto_vacuum=INCREMENTAL, expired usage-history pruning,
+and a full ANALYZE every SQLITE_ANALYZE_EVERY_RUNS runs. Everything runs on a dedicated
+connection (and thus thread), so requests on the main connection never queue behind it.
+With maintenance disabled, usage history is pruned from the request path instead
+(services.usage_history).
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import aiosqlite
+
+from config import Settings
+from core.database import apply_pragmas, optimize, sqlite_pragmas
+from repositories import SQLiteUsageHistoryRepository
+from services.usage_history import prune
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+_task: Optional[asyncio.Task] = None
+
+
+async def run_maintenance(conn: aiosqlite.Connection, settings: Settings, analyze: bool) -> dict:
+    started = time.perf_counter()
+    report: dict = {}
+    await optimize()
+    cursor = await conn.execute("PRAGMA journal_mode")
+    journal_mode = (await cursor.fetchone())[0]
+    await cursor.close()
+    if journal_mode.lower() == "wal":
+        cursor = await conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        busy, log_frames, checkpointed = await cursor.fetchone()
+        await cursor.close()
+        report["wal_frames"] = log_frames
+        report["wal_checkpointed"] = checkpointed
+    cursor = await conn.execute("PRAGMA auto_vacuum")
+    auto_vacuum = (await cursor.fetchone())[0]
+    await cursor.close()
+    if auto_vacuum == AUTO_VACUUM_INCREMENTAL:
+        cursor = await conn.execute("PRAGMA freelist_count")
+        report["free_pages"] = (await cursor.fetchone())[0]
+        await cursor.close()
+        await conn.execute(f"PRAGMA incremental_vacuum({int(settings.sqlite_incremental_vacuum_pages)})")
+    if analyze:
+        await conn.execute("ANALYZE")
+        report["analyzed"] = True
+    await conn.commit()
+    report["usage_samples_pruned"] = await prune(SQLiteUsageHistoryRepository(conn))
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+async def _loop(settings: Settings) -> None:
+    conn = await aiosqlite.connect(settings.database_path)
+    try:
+        pragmas = sqlite_pragmas(settings)
+        pragmas.pop("auto_vacuum", None)  # a database-level setting, already applied at init
+        await apply_pragmas(conn, pragmas)
+        runs = 0
+        while True:
+            await asyncio.sleep(settings.sqlite_maintenance_interval_seconds)
+            runs += 1
+            analyze = settings.sqlite_analyze_every_runs > 0 and runs % settings.sqlite_analyze_every_runs == 0
+            try:
+                logger.info("SQLite maintenance: %s", await run_maintenance(conn, settings, analyze))
+            except Exception as e:
+                logger.warning("SQLite maintenance failed: %s", e)
+    finally:
+        await conn.close()
+
+
+def start_maintenance() -> None:
+    global _task
+    settings = Settings()
+    if settings.sqlite_maintenance_interval_seconds <= 0 or _task is not None:
+        return
+    _task = asyncio.create_task(_loop(settings))
+
+
+async def stop_maintenance() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -0,0 +1,272 @@
+"""
+Opt-in per-request profiling (PROFILING_ENABLED + PROFILING_TOKEN).
+
+A request carrying `X-Profile: <PROFILING_TOKEN>` is sampled every PROFILING_INTERVAL_MS by
+a background thread for as long as it is handled (middlewares, dependencies, repository
+calls, Warpdrive client). Samples are attributed to the request, not to whatever else
+the event loop is doing:
+- while the request's code runs on the loop thread, the sample is that thread's stack
+  from the middleware frame down;
+- while it is suspended, the sample is the task's await chain ending in a
+  "(waiting) ..." frame, so time spent on the database or Warpdrive shows up where it
+  was awaited.
+
+The result is written to PROFILING_DIR as a speedscope profile (https://www.speedscope.app)
+and its id returned in `X-Profile-Id`; fetch it from GET /api/admin/profiles/{id}. Files
+rather than memory, so that under serve.py any worker can return a profile recorded by
+another. When profiling is disabled the middleware is not installed at all.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from types import FrameType
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+MAX_STACK_DEPTH = 256
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+PROFILE_ID = re.compile(r"^[0-9a-f]{16}$")
+INFO_SUFFIX = ".info.json"
+PROFILE_SUFFIX = ".speedscope.json"
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfileInfo(BaseModel):
+    id: str
+    method: str
+    path: str
+    status: Optional[int]
+    duration_ms: float
+    samples: int
+    created_at: datetime
+
+
+_FrameKey = Tuple[str, str, int]  # (name, file, first line)
+
+
+def _frame_key(frame: FrameType) -> _FrameKey:
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(_ROOT):
+        path = os.path.relpath(path, _ROOT)
+    return getattr(code, "co_qualname", code.co_name), path, code.co_firstlineno
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, loop_thread_id: int, root: FrameType, task: Optional[asyncio.Task], interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.loop_thread_id = loop_thread_id
+        self.root = root
+        self.task = task
+        self.interval = interval
+        self.frames: Dict[_FrameKey, int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self.started = time.perf_counter()
+        self._stop_event = threading.Event()
+
+    def _index(self, key: _FrameKey) -> int:
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _running_stack(self) -> Optional[List[_FrameKey]]:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            stack.append(_frame_key(frame))
+            if frame is self.root:
+                stack.reverse()
+                return stack
+            frame = frame.f_back
+        return None  # the loop is running something else
+
+    def _suspended_stack(self) -> List[_FrameKey]:
+        stack: List[_FrameKey] = []
+        awaitable = self.task.get_coro() if self.task is not None else None
+        while awaitable is not None and len(stack) < MAX_STACK_DEPTH:
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+            if frame is None:
+                break
+            if frame is self.root:  # start where running samples start
+                stack.clear()
+            stack.append(_frame_key(frame))
+            nxt = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+            if nxt is None or not (hasattr(nxt, "cr_frame") or hasattr(nxt, "gi_frame")):
+                stack.append((f"(waiting) {type(nxt).__name__ if nxt is not None else 'event loop'}", "", 0))
+                break
+            awaitable = nxt
+        return stack or [("(waiting)", "", 0)]
+
+    def run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            try:
+                stack = self._running_stack() or self._suspended_stack()
+            except Exception:  # frames mutate under us; drop the sample
+                continue
+            now = time.perf_counter()
+            self.samples.append([self._index(key) for key in stack])
+            self.weights.append((now - last) * 1000)
+            last = now
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def speedscope(self, name: str) -> dict:
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "vitality-console",
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [
+                    {"name": n, "file": f, "line": line} if f else {"name": n}
+                    for (n, f, line) in self.frames
+                ],
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(self.weights), 3),
+                "samples": self.samples,
+                "weights": [round(w, 3) for w in self.weights],
+            }],
+        }
+
+
+def _write(path: str, data: str) -> None:
+    tmp = f"{path}.{os.getpid()}.partial"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ProfileStore:
+    """
+    The most recent profiles, as <id>.info.json and <id>.speedscope.json files in one
+    directory shared by all workers. Blocking; call from a worker thread.
+    """
+
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def add(self, info: ProfileInfo, profile: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        _write(self._path(info.id, PROFILE_SUFFIX), json.dumps(profile, separators=(",", ":")))
+        _write(self._path(info.id, INFO_SUFFIX), info.model_dump_json())  # last: listed once complete
+        for old in self._infos()[self.max_entries:]:
+            for suffix in (INFO_SUFFIX, PROFILE_SUFFIX):
+                try:
+                    os.remove(self._path(old.id, suffix))
+                except FileNotFoundError:
+                    pass  # pruned by another worker
+
+    def _infos(self) -> List[ProfileInfo]:
+        """Every stored profile, newest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        infos = []
+        for name in names:
+            if not name.endswith(INFO_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    infos.append(ProfileInfo.model_validate_json(f.read()))
+            except (OSError, ValueError):
+                continue  # pruned meanwhile, or not ours
+        infos.sort(key=lambda info: info.created_at, reverse=True)
+        return infos
+
+    def list(self) -> List[ProfileInfo]:
+        return self._infos()[:self.max_entries]
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, PROFILE_SUFFIX), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+profile_store = ProfileStore(get_settings().profiling_dir, get_settings().profiling_max_profiles)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        settings = get_settings()
+        self.token = (settings.profiling_token or "").encode("utf-8")
+        self.interval = settings.profiling_interval_ms / 1000
+
+    def _requested(self, scope: Scope) -> bool:
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER:
+                return bool(self.token) and hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+        status: Optional[int] = None
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = _Sampler(threading.get_ident(), sys._getframe(), asyncio.current_task(), self.interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            duration_ms = (time.perf_counter() - sampler.started) * 1000
+            name = f"{scope['method']} {scope['path']}"
+            info = ProfileInfo(
+                id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=round(duration_ms, 3),
+                samples=len(sampler.samples),
+                created_at=datetime.utcnow(),
+            )
+            try:
+                await asyncio.to_thread(profile_store.add, info, sampler.speedscope(name))
+            except OSError:
+                logger.exception("Could not store profile %s", profile_id)
+            logger.info("Profiled %s in %.1f ms (%s samples): %s", name, duration_ms, len(sampler.samples), profile_id)
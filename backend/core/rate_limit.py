@@ -0,0 +1,159 @@
+"""
+Admission control: per-principal token buckets and a global in-flight limit.
+
+Rejections (429 / 503) are produced here, before routing, so an abusive client never
+reaches bcrypt, the database or Warpdrive. Requests carrying the Warpdrive service
+secret skip the token buckets and may use the concurrency slots reserved for them.
+"""
+import hmac
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# (path prefix, route group); first match wins, anything else is "default".
+ROUTE_GROUPS = (
+    ("/api/auth/login", "login"),
+    ("/api/auth/register", "login"),
+    ("/api/auth/google-login", "login"),
+    ("/api/auth/s3-credentials", "credentials"),
+)
+
+MAX_TRACKED_PRINCIPALS = 100_000
+
+
+def route_group(path: str) -> str:
+    for prefix, group in ROUTE_GROUPS:
+        if path.startswith(prefix):
+            return group
+    return "default"
+
+
+def parse_rate(spec: str) -> Tuple[float, float]:
+    """Parse "<requests>/<seconds>" into (refill rate per second, burst capacity)."""
+    count, _, seconds = spec.partition("/")
+    capacity = float(count)
+    period = float(seconds or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit: {spec!r}")
+    return capacity / period, capacity
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def consume(self, now: float) -> float:
+        """Take one token. Returns 0 on success, else seconds until a token is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets keyed by (route group, principal), bounded with LRU eviction."""
+
+    def __init__(self, rates: Dict[str, str], max_entries: int = MAX_TRACKED_PRINCIPALS):
+        self._rates = {group: parse_rate(spec) for group, spec in rates.items()}
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._max_entries = max_entries
+
+    def check(self, group: str, principal: str, now: Optional[float] = None) -> float:
+        rate = self._rates.get(group) or self._rates.get("default")
+        if rate is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        key = (group, principal)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate[0], rate[1], now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self._max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.consume(now)
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, settings: Optional[Settings] = None):
+        self.app = app
+        self.settings = settings or get_settings()
+        self.limiter = RateLimiter(self.settings.rate_limits)
+        self.max_concurrent = self.settings.max_concurrent_requests
+        self.reserved = min(self.settings.warpdrive_reserved_concurrency, self.max_concurrent)
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.settings.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = _headers(scope)
+        trusted = self._is_warpdrive(headers)
+        if not trusted:
+            group = route_group(scope["path"])
+            retry_after = self.limiter.check(group, self._principal(scope, headers))
+            if retry_after:
+                await _reject(scope, receive, send, 429, "Too many requests", retry_after)
+                return
+
+        limit = self.max_concurrent if trusted else self.max_concurrent - self.reserved
+        if self.in_flight >= limit:
+            await _reject(scope, receive, send, 503, "Server busy, retry shortly", 1)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    def _is_warpdrive(self, headers: Dict[bytes, bytes]) -> bool:
+        expected = self.settings.warpdrive_service_secret
+        provided = headers.get(b"x-warpdrive-secret")
+        if not expected or not provided:
+            return False
+        return hmac.compare_digest(provided, expected.encode("utf-8"))
+
+    def _principal(self, scope: Scope, headers: Dict[bytes, bytes]) -> str:
+        """Bearer tokens are verified (HMAC only, no DB) so forged tokens fall back to the IP."""
+        auth = headers.get(b"authorization", b"")
+        if auth[:7].lower() == b"bearer ":
+            try:
+                payload = jwt.decode(auth[7:].decode("latin-1"), self.settings.secret_key, algorithms=["HS256"])
+                if payload.get("sub"):
+                    return f"user:{payload['sub']}"
+            except JWTError:
+                pass
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+
+def _headers(scope: Scope) -> Dict[bytes, bytes]:
+    return {k: v for k, v in scope.get("headers", ())}
+
+
+async def _reject(scope: Scope, receive: Receive, send: Send, status_code: int, detail: str, retry_after: float) -> None:
+    response = JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+    await response(scope, receive, send)
@@ -0,0 +1,44 @@
+"""
+Fast JSON responses. orjson is used when installed, otherwise compact stdlib json.
+
+Hot routes that already hold validated models can return `prevalidated(...)`, which
+serializes with pydantic-core directly and bypasses FastAPI's response_model pass.
+"""
+import json
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+def prevalidated(
+    content: Any,
+    adapter: TypeAdapter,
+    status_code: int = 200,
+    headers: Optional[dict] = None,
+) -> Response:
+    """Serialize already-validated content with `adapter` without re-validating it."""
+    return Response(
+        adapter.dump_json(content),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
@@ -0,0 +1,197 @@
+"""
+Serves the built frontend (frontend/build) from the API process.
+
+The build directory is indexed once at startup:
+- precompressed siblings (`app.js.br`, `app.js.gz`) are used when present; otherwise small
+  text assets are gzip- (and, if the `brotli` module is installed, brotli-) compressed in memory;
+- files up to FRONTEND_MEMORY_CACHE_MAX_BYTES are held in memory with their variants;
+- larger files are sent from disk, via the ASGI zero-copy extension when the server offers it.
+
+Content-hashed names (main.1a2b3c4d.js) get `Cache-Control: immutable`; everything else,
+including index.html, is revalidated with its ETag. Unknown extension-less paths fall back
+to index.html so client-side routes work on reload, except under the API prefixes
+(/api/, /docs, /openapi.json), where an unknown path is a plain 404.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+from starlette.websockets import WebSocketClose
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.(?:chunk\.)?[A-Za-z0-9]+$")
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/manifest+json")
+MIN_COMPRESS_BYTES = 256
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+ENCODINGS = ("br", "gzip")  # preference order
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# First path segments owned by the API: never answered with the SPA shell.
+API_SEGMENTS = ("api", "docs", "redoc", "openapi.json")
+
+
+class _Variant(NamedTuple):
+    path: str
+    size: int
+    body: Optional[bytes]  # in memory when small enough
+
+
+class _Asset(NamedTuple):
+    content_type: str
+    etag: str
+    cache_control: str
+    variants: Dict[str, _Variant]  # "identity" / "br" / "gzip"
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    accepted = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.append(name.strip().lower())
+    return accepted
+
+
+class FrontendApp:
+    def __init__(self, directory: str, memory_cache_max_bytes: int = 256 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.memory_cache_max_bytes = memory_cache_max_bytes
+        self.assets: Dict[str, _Asset] = {}
+        self._index()
+
+    def _index(self) -> None:
+        if not os.path.isfile(os.path.join(self.directory, "index.html")):
+            raise RuntimeError(f"Frontend build not found: {self.directory}/index.html is missing")
+        in_memory = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith((".br", ".gz")):
+                    continue
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, self.directory).replace(os.sep, "/")
+                asset = self._load(full, name)
+                self.assets[rel] = asset
+                in_memory += sum(len(v.body) for v in asset.variants.values() if v.body is not None)
+        logger.info(
+            "Frontend: serving %s assets from %s (%s KiB in memory)",
+            len(self.assets), self.directory, in_memory // 1024,
+        )
+
+    def _load(self, path: str, name: str) -> _Asset:
+        stat = os.stat(path)
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        small = stat.st_size <= self.memory_cache_max_bytes
+        body = None
+        if small:
+            with open(path, "rb") as f:
+                body = f.read()
+        variants = {"identity": _Variant(path, stat.st_size, body)}
+
+        for encoding, suffix in SUFFIXES.items():
+            sibling = path + suffix
+            if os.path.isfile(sibling):
+                size = os.path.getsize(sibling)
+                data = None
+                if size <= self.memory_cache_max_bytes:
+                    with open(sibling, "rb") as f:
+                        data = f.read()
+                variants[encoding] = _Variant(sibling, size, data)
+        compressible = content_type.startswith(COMPRESSIBLE_TYPES)
+        if body is not None and compressible and len(body) >= MIN_COMPRESS_BYTES:
+            if "gzip" not in variants:
+                variants["gzip"] = _Variant(path, 0, gzip.compress(body, compresslevel=9, mtime=0))
+            if "br" not in variants and brotli is not None:
+                variants["br"] = _Variant(path, 0, brotli.compress(body))
+            # Drop variants that do not actually save bytes.
+            variants = {
+                k: v for k, v in variants.items()
+                if k == "identity" or (len(v.body) if v.body is not None else v.size) < len(body)
+            }
+
+        digest = hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:20]
+        if "charset" not in content_type and content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        return _Asset(
+            content_type=content_type,
+            etag=digest,
+            cache_control=IMMUTABLE if HASHED_NAME.search(name) else REVALIDATE,
+            variants=variants,
+        )
+
+    def _lookup(self, path: str) -> Optional[_Asset]:
+        rel = path.lstrip("/")
+        if rel == "":
+            rel = "index.html"
+        asset = self.assets.get(rel)
+        if asset is None and rel.split("/", 1)[0] in API_SEGMENTS:
+            return None  # a mistyped or removed API route must not look like a 200
+        if asset is None and "." not in rel.rsplit("/", 1)[-1]:
+            asset = self.assets.get("index.html")  # client-side route
+        return asset
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "websocket":
+            await WebSocketClose()(scope, receive, send)  # no websocket routes are served here
+            return
+        if scope["type"] != "http":
+            return
+        if scope["method"] not in ("GET", "HEAD"):
+            await PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})(scope, receive, send)
+            return
+        asset = self._lookup(scope["path"])
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        headers = dict((k.decode("latin-1"), v.decode("latin-1")) for k, v in scope.get("headers", ()))
+        accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+        encoding, variant = next(
+            ((e, asset.variants[e]) for e in ENCODINGS if e in accepted and e in asset.variants),
+            ("identity", asset.variants["identity"]),
+        )
+        etag = f'"{asset.etag}-{encoding}"'
+        response_headers = {
+            "ETag": etag,
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+
+        if_none_match = headers.get("if-none-match", "")
+        if etag in (t.strip() for t in if_none_match.split(",")):
+            await Response(status_code=304, headers=response_headers)(scope, receive, send)
+            return
+
+        if variant.body is not None:
+            body = b"" if scope["method"] == "HEAD" else variant.body
+            response_headers["Content-Length"] = str(len(variant.body))
+            await Response(body, headers=response_headers, media_type=asset.content_type)(scope, receive, send)
+        elif "http.response.zerocopysend" in scope.get("extensions", {}) and scope["method"] == "GET":
+            await self._zerocopy(send, variant, asset.content_type, response_headers)
+        else:
+            await FileResponse(
+                variant.path,
+                headers=response_headers,
+                media_type=asset.content_type,
+            )(scope, receive, send)
+
+    async def _zerocopy(self, send: Send, variant: _Variant, content_type: str, headers: Dict[str, str]) -> None:
+        raw: List[Tuple[bytes, bytes]] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+        raw += [(b"content-type", content_type.encode("latin-1")), (b"content-length", str(variant.size).encode())]
+        with open(variant.path, "rb") as f:
+            await send({"type": "http.response.start", "status": 200, "headers": raw})
+            await send({"type": "http.response.zerocopysend", "file": f.fileno(), "count": variant.size})
@@ -1,10 +1,31 @@
+import asyncio
+
 from fastapi import FastAPI
+from config import get_settings, worker_id
 from fastapi.middleware.cors import CORSMiddleware
+from core.credential_socket import start_credential_socket, stop_credential_socket
 from core.database import init_sqlite, close_sqlite
-from routers import auth, buckets, api_keys
+from core.deadline import DeadlineMiddleware
+from core.loop_monitor import start_loop_monitor, stop_loop_monitor
+from core.maintenance import start_maintenance, stop_maintenance
+from core.profiling import ProfilingMiddleware
+from core.rate_limit import RateLimitMiddleware
+from core.responses import FastJSONResponse
+from core.static_files import FrontendApp
+from routers import admin, auth, buckets, api_keys
+from services.auth import configure_bcrypt
+from services.key_filter import start_key_filter
+from services.usage_ingest import start_usage_ingest, stop_usage_ingest
 
-app = FastAPI(title="Vitality Console")
+app = FastAPI(title="Vitality Console", default_response_class=FastJSONResponse)
+settings = get_settings()
 
+if settings.profiling_enabled and settings.profiling_token:
+    # Innermost, so a profile covers the request's own handling rather than admission control.
+    app.add_middleware(ProfilingMiddleware)
+# Added before CORS so that CORS stays outermost and 429/503 rejections carry CORS headers.
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,22 +38,42 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     await init_sqlite()
+    await asyncio.to_thread(configure_bcrypt)
+    await start_key_filter()
+    start_usage_ingest()
+    start_loop_monitor()
+    if worker_id() == 0:
+        # One per host: the maintenance task and the socket path are shared by all workers.
+        start_maintenance()
+        await start_credential_socket()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await stop_credential_socket()
+    await stop_loop_monitor()
+    await stop_usage_ingest()
+    await stop_maintenance()
     await close_sqlite()
 
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(buckets.router, prefix="/api/buckets", tags=["buckets"])
 app.include_router(api_keys.router, prefix="/api/auth", tags=["api-keys"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
-
-@app.get("/")
-async def root():
-    return {
-        "message": "Vitality Console",
-        "docs": "/docs",
-        "redoc": "/redoc",
-    }
+if settings.frontend_build_dir:
+    # Mounted last so every API route above takes precedence over the static catch-all.
+    app.mount(
+        "/",
+        FrontendApp(settings.frontend_build_dir, settings.frontend_memory_cache_max_bytes),
+        name="frontend",
+    )
+else:
+    @app.get("/")
+    async def root():
+        return {
+            "message": "Vitality Console",
+            "docs": "/docs",
+            "redoc": "/redoc",
+        }
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, Literal
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 class User(BaseModel):
     email: EmailStr
@@ -9,8 +9,8 @@ class User(BaseModel):
     picture: Optional[str] = None
     password_hash: Optional[str] = None
     auth_provider: Optional[Literal["google", "email"]] = None
-    created_at: datetime = datetime.utcnow()
-    updated_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
         json_encoders = {
@@ -1,11 +1,31 @@
-from .interfaces import UserRepository, ApiKeyRepository, BucketRepository
-from .sqlite_repositories import SQLiteUserRepository, SQLiteApiKeyRepository, SQLiteBucketRepository
+from .interfaces import (
+    UserRepository,
+    ApiKeyRepository,
+    BucketRepository,
+    AnalyticsRepository,
+    UsageHistoryRepository,
+    BucketCounterRepository,
+)
+from .sqlite_repositories import (
+    SQLiteUserRepository,
+    SQLiteApiKeyRepository,
+    SQLiteBucketRepository,
+    SQLiteAnalyticsRepository,
+    SQLiteUsageHistoryRepository,
+    SQLiteBucketCounterRepository,
+)
 
 __all__ = [
     "UserRepository",
     "ApiKeyRepository",
     "BucketRepository",
+    "AnalyticsRepository",
+    "UsageHistoryRepository",
+    "BucketCounterRepository",
     "SQLiteUserRepository",
     "SQLiteApiKeyRepository",
     "SQLiteBucketRepository",
+    "SQLiteAnalyticsRepository",
+    "SQLiteUsageHistoryRepository",
+    "SQLiteBucketCounterRepository",
 ]
@@ -1,11 +1,15 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
 # Use dict/DTO for repo layer; models can be built from these
 UserRow = dict
 ApiKeyRow = dict
+ApiKeyChangeRow = dict
 BucketRow = dict
+RollupRow = dict
+UsageSampleRow = dict
+BucketCounts = Tuple[int, int]  # (object_count, total_size)
 
 
 class UserRepository(ABC):
@@ -21,6 +25,11 @@ class UserRepository(ABC):
     async def create(self, user: UserRow) -> None:
         pass
 
+    @abstractmethod
+    async def create_if_absent(self, user: UserRow) -> bool:
+        """Insert the user unless the email is taken; returns True if the row was created."""
+        pass
+
     @abstractmethod
     async def update(self, email: str, updates: dict) -> None:
         pass
@@ -47,6 +56,19 @@ class ApiKeyRepository(ABC):
     ) -> None:
         pass
 
+    @abstractmethod
+    async def create_if_owner_has_none(
+        self,
+        access_key: str,
+        owner_id: str,
+        secret_key: str,
+        *,
+        created_at: Optional[datetime] = None,
+        status: str = "active",
+    ) -> bool:
+        """Insert the key unless the owner already has one; returns True if the row was created."""
+        pass
+
     @abstractmethod
     async def delete_by_owner_id(self, owner_id: str) -> bool:
         """Returns True if a row was deleted."""
@@ -57,12 +79,37 @@ class ApiKeyRepository(ABC):
         """Return api key rows without secret (for listing)."""
         pass
 
+    @abstractmethod
+    async def list_active(self) -> List[ApiKeyRow]:
+        """Return all active api key rows, including secrets (for server-side fan-out)."""
+        pass
+
+    @abstractmethod
+    async def list_changes(self, after_seq: int, limit: int = 500) -> List[ApiKeyChangeRow]:
+        """Key created/deleted events with seq > after_seq, oldest first."""
+        pass
+
+    @abstractmethod
+    async def latest_change_seq(self) -> int:
+        """Sequence number of the newest key change event (0 if none)."""
+        pass
+
+    @abstractmethod
+    async def snapshot_access_keys(self) -> Tuple[List[str], int]:
+        """Every access key and the newest change seq, read as one consistent snapshot."""
+        pass
+
 
 class BucketRepository(ABC):
     @abstractmethod
     async def create(self, bucket: BucketRow) -> None:
         pass
 
+    @abstractmethod
+    async def create_if_absent(self, bucket: BucketRow) -> bool:
+        """Insert the bucket unless the owner has one with that name; returns True if the row was created."""
+        pass
+
     @abstractmethod
     async def list_by_owner_id(self, owner_id: str) -> List[BucketRow]:
         pass
@@ -70,3 +117,64 @@ class BucketRepository(ABC):
     @abstractmethod
     async def get_by_owner_and_name(self, owner_id: str, bucket_name: str) -> Optional[BucketRow]:
         pass
+
+    @abstractmethod
+    async def get_version(self, owner_id: str) -> str:
+        """Cheap marker that changes whenever the owner's bucket set changes."""
+        pass
+
+
+class AnalyticsRepository(ABC):
+    @abstractmethod
+    async def daily_counts(
+        self,
+        start_day: str,
+        end_day: str,
+        metric: Optional[str] = None,
+    ) -> List[RollupRow]:
+        """Rows {day, metric, dimension, count} for start_day <= day <= end_day (YYYY-MM-DD)."""
+        pass
+
+
+class UsageHistoryRepository(ABC):
+    @abstractmethod
+    async def record(
+        self,
+        owner_id: str,
+        samples: Sequence[Tuple[str, str, int, int, int]],
+    ) -> None:
+        """Upsert (resolution, bucket_name, ts, object_count, total_size) samples; the latest value per slot wins."""
+        pass
+
+    @abstractmethod
+    async def query(
+        self,
+        owner_id: str,
+        bucket_name: str,
+        resolution: str,
+        start_ts: int,
+        end_ts: int,
+    ) -> List[UsageSampleRow]:
+        """Rows {ts, object_count, total_size} with start_ts <= ts <= end_ts, oldest first."""
+        pass
+
+    @abstractmethod
+    async def prune(self, cutoffs: Dict[str, int]) -> int:
+        """Delete samples older than cutoffs[resolution]; returns rows deleted."""
+        pass
+
+
+class BucketCounterRepository(ABC):
+    @abstractmethod
+    async def apply_deltas(self, deltas: Sequence[Tuple[str, str, int, int]]) -> None:
+        """Add (owner_id, bucket_name, Δobject_count, Δtotal_size) to the counters, creating them as needed."""
+        pass
+
+    @abstractmethod
+    async def get_by_owner_id(self, owner_id: str) -> Dict[str, BucketCounts]:
+        """bucket_name -> (object_count, total_size) for every counted bucket of the owner."""
+        pass
+
+    @abstractmethod
+    async def get(self, owner_id: str, bucket_name: str) -> Optional[BucketCounts]:
+        pass
@@ -1,8 +1,12 @@
 import aiosqlite
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from .interfaces import UserRepository, ApiKeyRepository, BucketRepository, UserRow, ApiKeyRow, BucketRow
+from .interfaces import (
+    UserRepository, ApiKeyRepository, BucketRepository, AnalyticsRepository, UsageHistoryRepository,
+    BucketCounterRepository,
+    UserRow, ApiKeyRow, ApiKeyChangeRow, BucketRow, RollupRow, UsageSampleRow, BucketCounts,
+)
 
 
 def _row_to_user(row: Optional[tuple], keys: List[str]) -> Optional[UserRow]:
@@ -17,6 +21,11 @@ def _row_to_api_key(row: Optional[tuple], keys: List[str]) -> Optional[ApiKeyRow
     return dict(zip(keys, row))
 
 
+def _counts(object_count: int, total_size: int) -> BucketCounts:
+    # Stored signed, so deltas that arrive out of order still net out; never shown negative.
+    return max(0, object_count), max(0, total_size)
+
+
 class SQLiteUserRepository(UserRepository):
     USER_KEYS = [
         "email", "google_id", "full_name", "picture", "password_hash",
@@ -46,7 +55,7 @@ class SQLiteUserRepository(UserRepository):
         await cursor.close()
         return _row_to_user(row, self.USER_KEYS)
 
-    async def create(self, user: UserRow) -> None:
+    def _user_values(self, user: UserRow) -> tuple:
         now = datetime.utcnow()
         created = user.get("created_at", now)
         updated = user.get("updated_at", now)
@@ -54,22 +63,35 @@ class SQLiteUserRepository(UserRepository):
             created = created.isoformat()
         if isinstance(updated, datetime):
             updated = updated.isoformat()
+        return (
+            user.get("email"),
+            user.get("google_id"),
+            user.get("full_name", ""),
+            user.get("picture"),
+            user.get("password_hash"),
+            user.get("auth_provider"),
+            created,
+            updated,
+        )
+
+    async def create(self, user: UserRow) -> None:
         await self._conn.execute(
             "INSERT INTO users (email, google_id, full_name, picture, password_hash, "
             "auth_provider, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                user.get("email"),
-                user.get("google_id"),
-                user.get("full_name", ""),
-                user.get("picture"),
-                user.get("password_hash"),
-                user.get("auth_provider"),
-                created,
-                updated,
-            ),
+            self._user_values(user),
         )
         await self._conn.commit()
 
+    async def create_if_absent(self, user: UserRow) -> bool:
+        cursor = await self._conn.execute(
+            "INSERT INTO users (email, google_id, full_name, picture, password_hash, "
+            "auth_provider, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (email) DO NOTHING",
+            self._user_values(user),
+        )
+        await self._conn.commit()
+        return cursor.rowcount > 0
+
     async def update(self, email: str, updates: dict) -> None:
         allowed = {"google_id", "full_name", "picture", "password_hash", "auth_provider", "updated_at"}
         updates = dict(updates)
@@ -94,6 +116,7 @@ class SQLiteUserRepository(UserRepository):
 
 class SQLiteApiKeyRepository(ApiKeyRepository):
     API_KEY_KEYS = ["access_key", "owner_id", "secret_key", "created_at", "status"]
+    API_KEY_CHANGE_KEYS = ["seq", "event", "access_key", "owner_id", "created_at"]
 
     def __init__(self, conn: aiosqlite.Connection):
         self._conn = conn
@@ -137,6 +160,27 @@ class SQLiteApiKeyRepository(ApiKeyRepository):
         )
         await self._conn.commit()
 
+    async def create_if_owner_has_none(
+        self,
+        access_key: str,
+        owner_id: str,
+        secret_key: str,
+        *,
+        created_at: Optional[datetime] = None,
+        status: str = "active",
+    ) -> bool:
+        now = created_at or datetime.utcnow()
+        if isinstance(now, datetime):
+            now = now.isoformat()
+        # One statement, so the existence check and the insert cannot interleave with another writer.
+        cursor = await self._conn.execute(
+            "INSERT INTO api_keys (access_key, owner_id, secret_key, created_at, status) "
+            "SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM api_keys WHERE owner_id = ?)",
+            (access_key, owner_id, secret_key, now, status, owner_id),
+        )
+        await self._conn.commit()
+        return cursor.rowcount > 0
+
     async def delete_by_owner_id(self, owner_id: str) -> bool:
         cursor = await self._conn.execute(
             "DELETE FROM api_keys WHERE owner_id = ?", (owner_id,)
@@ -160,6 +204,44 @@ class SQLiteApiKeyRepository(ApiKeyRepository):
             result.append(d)
         return result
 
+    async def list_active(self) -> List[ApiKeyRow]:
+        cursor = await self._conn.execute(
+            "SELECT access_key, owner_id, secret_key, created_at, status "
+            "FROM api_keys WHERE status = 'active' ORDER BY owner_id"
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        keys = self.API_KEY_KEYS
+        return [dict(zip(keys, row)) for row in rows]
+
+    async def list_changes(self, after_seq: int, limit: int = 500) -> List[ApiKeyChangeRow]:
+        cursor = await self._conn.execute(
+            "SELECT seq, event, access_key, owner_id, created_at FROM api_key_changes "
+            "WHERE seq > ? ORDER BY seq LIMIT ?",
+            (after_seq, limit),
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        keys = self.API_KEY_CHANGE_KEYS
+        return [dict(zip(keys, row)) for row in rows]
+
+    async def latest_change_seq(self) -> int:
+        cursor = await self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM api_key_changes")
+        row = await cursor.fetchone()
+        await cursor.close()
+        return row[0]
+
+    async def snapshot_access_keys(self) -> Tuple[List[str], int]:
+        # One statement, so the key set and the seq come from the same read snapshot.
+        cursor = await self._conn.execute(
+            "SELECT NULL, COALESCE(MAX(seq), 0) FROM api_key_changes "
+            "UNION ALL SELECT access_key, NULL FROM api_keys"
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        seq = next(row[1] for row in rows if row[0] is None)
+        return [row[0] for row in rows if row[0] is not None], seq
+
 
 class SQLiteBucketRepository(BucketRepository):
     BUCKET_KEYS = ["bucket_name", "owner_id", "access_policies", "type", "created_at"]
@@ -167,23 +249,34 @@ class SQLiteBucketRepository(BucketRepository):
     def __init__(self, conn: aiosqlite.Connection):
         self._conn = conn
 
-    async def create(self, bucket: BucketRow) -> None:
-        now = datetime.utcnow()
-        created = bucket.get("created_at", now)
+    def _bucket_values(self, bucket: BucketRow) -> tuple:
+        created = bucket.get("created_at", datetime.utcnow())
         if isinstance(created, datetime):
             created = created.isoformat()
+        return (
+            bucket["bucket_name"],
+            bucket["owner_id"],
+            bucket.get("access_policies"),
+            bucket.get("type", "general_purpose"),
+            created,
+        )
+
+    async def create(self, bucket: BucketRow) -> None:
         await self._conn.execute(
             "INSERT INTO buckets (bucket_name, owner_id, access_policies, type, created_at) "
             "VALUES (?, ?, ?, ?, ?)",
-            (
-                bucket["bucket_name"],
-                bucket["owner_id"],
-                bucket.get("access_policies"),
-                bucket.get("type", "general_purpose"),
-                created,
-            ),
+            self._bucket_values(bucket),
+        )
+        await self._conn.commit()
+
+    async def create_if_absent(self, bucket: BucketRow) -> bool:
+        cursor = await self._conn.execute(
+            "INSERT INTO buckets (bucket_name, owner_id, access_policies, type, created_at) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (owner_id, bucket_name) DO NOTHING",
+            self._bucket_values(bucket),
         )
         await self._conn.commit()
+        return cursor.rowcount > 0
 
     async def list_by_owner_id(self, owner_id: str) -> List[BucketRow]:
         cursor = await self._conn.execute(
@@ -206,3 +299,130 @@ class SQLiteBucketRepository(BucketRepository):
         if not row:
             return None
         return dict(zip(self.BUCKET_KEYS, row))
+
+    async def get_version(self, owner_id: str) -> str:
+        # Buckets are only ever inserted, so count + newest created_at identifies the set.
+        cursor = await self._conn.execute(
+            "SELECT COUNT(*), MAX(created_at) FROM buckets WHERE owner_id = ?",
+            (owner_id,),
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
+        return f"{row[0]}:{row[1] or ''}"
+
+
+class SQLiteAnalyticsRepository(AnalyticsRepository):
+    """Reads the trigger-maintained daily_rollups table only."""
+
+    ROLLUP_KEYS = ["day", "metric", "dimension", "count"]
+
+    def __init__(self, conn: aiosqlite.Connection):
+        self._conn = conn
+
+    async def daily_counts(
+        self,
+        start_day: str,
+        end_day: str,
+        metric: Optional[str] = None,
+    ) -> List[RollupRow]:
+        query = "SELECT day, metric, dimension, count FROM daily_rollups WHERE day BETWEEN ? AND ?"
+        params: tuple = (start_day, end_day)
+        if metric:
+            query += " AND metric = ?"
+            params += (metric,)
+        cursor = await self._conn.execute(query + " ORDER BY day, metric, dimension", params)
+        rows = await cursor.fetchall()
+        await cursor.close()
+        keys = self.ROLLUP_KEYS
+        return [dict(zip(keys, row)) for row in rows]
+
+
+class SQLiteUsageHistoryRepository(UsageHistoryRepository):
+    SAMPLE_KEYS = ["ts", "object_count", "total_size"]
+
+    def __init__(self, conn: aiosqlite.Connection):
+        self._conn = conn
+
+    async def record(
+        self,
+        owner_id: str,
+        samples: Sequence[Tuple[str, str, int, int, int]],
+    ) -> None:
+        await self._conn.executemany(
+            "INSERT INTO usage_samples (owner_id, resolution, bucket_name, ts, object_count, total_size) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (owner_id, resolution, bucket_name, ts) DO UPDATE SET "
+            "object_count = excluded.object_count, total_size = excluded.total_size",
+            [(owner_id, *sample) for sample in samples],
+        )
+        await self._conn.commit()
+
+    async def query(
+        self,
+        owner_id: str,
+        bucket_name: str,
+        resolution: str,
+        start_ts: int,
+        end_ts: int,
+    ) -> List[UsageSampleRow]:
+        cursor = await self._conn.execute(
+            "SELECT ts, object_count, total_size FROM usage_samples "
+            "WHERE owner_id = ? AND resolution = ? AND bucket_name = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+            (owner_id, resolution, bucket_name, start_ts, end_ts),
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        keys = self.SAMPLE_KEYS
+        return [dict(zip(keys, row)) for row in rows]
+
+    async def prune(self, cutoffs: Dict[str, int]) -> int:
+        deleted = 0
+        for resolution, cutoff in cutoffs.items():
+            cursor = await self._conn.execute(
+                "DELETE FROM usage_samples WHERE resolution = ? AND ts < ?",
+                (resolution, cutoff),
+            )
+            deleted += cursor.rowcount
+        await self._conn.commit()
+        return deleted
+
+
+class SQLiteBucketCounterRepository(BucketCounterRepository):
+    def __init__(self, conn: aiosqlite.Connection):
+        self._conn = conn
+
+    async def apply_deltas(self, deltas: Sequence[Tuple[str, str, int, int]]) -> None:
+        now = datetime.utcnow().isoformat()
+        try:
+            await self._conn.executemany(
+                "INSERT INTO bucket_counters (owner_id, bucket_name, object_count, total_size, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (owner_id, bucket_name) DO UPDATE SET "
+                "object_count = object_count + excluded.object_count, "
+                "total_size = total_size + excluded.total_size, "
+                "updated_at = excluded.updated_at",
+                [(*delta, now) for delta in deltas],
+            )
+            await self._conn.commit()
+        except Exception:
+            # Don't leave half a batch in the shared connection's transaction for the next commit.
+            await self._conn.rollback()
+            raise
+
+    async def get_by_owner_id(self, owner_id: str) -> Dict[str, BucketCounts]:
+        cursor = await self._conn.execute(
+            "SELECT bucket_name, object_count, total_size FROM bucket_counters WHERE owner_id = ?",
+            (owner_id,),
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return {row[0]: _counts(row[1], row[2]) for row in rows}
+
+    async def get(self, owner_id: str, bucket_name: str) -> Optional[BucketCounts]:
+        cursor = await self._conn.execute(
+            "SELECT object_count, total_size FROM bucket_counters WHERE owner_id = ? AND bucket_name = ?",
+            (owner_id, bucket_name),
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
+        return _counts(row[0], row[1]) if row else None
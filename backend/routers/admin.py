@@ -0,0 +1,121 @@
+"""Admin-only endpoints (users listed in ADMIN_EMAILS)."""
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from core.backup import BackupBusy, BackupResult, run_backup
+from core.database import ROLLUP_SOURCES, get_analytics_repo
+from core.loop_monitor import LoopLagStats, get_loop_monitor
+from core.profiling import ProfileInfo, profile_store
+from models.user import User
+from services.auth import get_current_admin
+from services.usage_report import UsageReportAggregator, iter_owner_usage
+
+router = APIRouter()
+
+
+@router.get("/usage-report")
+async def usage_report(
+    top: int = Query(10, ge=0, le=1000),
+    concurrency: Optional[int] = Query(None, ge=1, le=64),
+    _admin: User = Depends(get_current_admin),
+):
+    """
+    Platform-wide usage, streamed as NDJSON: one {"type": "owner", ...} line per owner as
+    soon as its stats arrive, then a final {"type": "summary", ...} line with totals,
+    per-bucket-type totals and the top tenants by bytes stored.
+    """
+    async def lines():
+        aggregator = UsageReportAggregator(top_n=top)
+        async for usage in iter_owner_usage(concurrency=concurrency):
+            aggregator.add(usage)
+            yield '{"type":"owner",' + usage.model_dump_json()[1:] + "\n"
+        yield '{"type":"summary",' + aggregator.summary().model_dump_json()[1:] + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/analytics")
+async def analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    metric: Optional[str] = None,
+    _admin: User = Depends(get_current_admin),
+):
+    """
+    Daily counts of signups (by auth provider), keys_issued and buckets_created (by type)
+    between start and end inclusive (default: the last 30 days). Served from the
+    daily_rollups table, so cost grows with days in range rather than rows.
+    """
+    if metric is not None and metric not in ROLLUP_SOURCES:
+        raise HTTPException(400, f"metric must be one of: {', '.join(ROLLUP_SOURCES)}")
+    end = end or datetime.utcnow().date()  # created_at, and so rollup days, are UTC
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(400, "start must not be after end")
+    rows = await get_analytics_repo().daily_counts(start.isoformat(), end.isoformat(), metric)
+    metrics = {
+        name: {"total": 0, "by_dimension": {}, "daily": []}
+        for name in ROLLUP_SOURCES
+        if metric is None or name == metric
+    }
+    for row in rows:
+        m = metrics.get(row["metric"])
+        if m is None:
+            continue
+        m["total"] += row["count"]
+        m["by_dimension"][row["dimension"]] = m["by_dimension"].get(row["dimension"], 0) + row["count"]
+        m["daily"].append({"day": row["day"], "dimension": row["dimension"], "count": row["count"]})
+    return {"start": start.isoformat(), "end": end.isoformat(), "metrics": metrics}
+
+
+@router.post("/backup", response_model=BackupResult)
+async def backup(
+    compress: bool = False,
+    _admin: User = Depends(get_current_admin),
+):
+    """
+    Online backup of the Console database into BACKUP_DIR using the SQLite backup API,
+    in small page steps on a separate connection; requests keep being served meanwhile.
+    Returns the file written and its throughput. Restore with `python -m core.backup restore`.
+    """
+    try:
+        return await run_backup(compress=compress)
+    except BackupBusy as e:
+        raise HTTPException(503, f"Backup failed: {e}", headers={"Retry-After": "60"})
+    except Exception as e:
+        raise HTTPException(500, f"Backup failed: {e}")
+
+
+@router.get("/profiles", response_model=List[ProfileInfo])
+async def list_profiles(_admin: User = Depends(get_current_admin)):
+    """Recent request profiles (requests sent with `X-Profile: <PROFILING_TOKEN>`), newest first."""
+    return await asyncio.to_thread(profile_store.list)
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, _admin: User = Depends(get_current_admin)):
+    """One profile in speedscope format; open it at https://www.speedscope.app."""
+    profile = await asyncio.to_thread(profile_store.get, profile_id)
+    if profile is None:
+        raise HTTPException(404, "Profile not found")
+    return JSONResponse(
+        profile,
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'},
+    )
+
+
+@router.get("/loop", response_model=LoopLagStats)
+async def loop_lag(_admin: User = Depends(get_current_admin)):
+    """
+    Event-loop lag of this worker: percentiles over the last minute, lifetime max, a
+    histogram and stalls over LOOP_BLOCK_THRESHOLD_MS. With LOOP_MONITOR_DEBUG, also the
+    stacks captured while the loop was blocked.
+    """
+    monitor = get_loop_monitor()
+    if monitor is None:
+        raise HTTPException(404, "Loop monitor is disabled")
+    return monitor.stats()
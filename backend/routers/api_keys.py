@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from services.auth import auth_service, get_api_key_repo_dep
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from services.auth import auth_service, get_api_key_repo_dep, require_warpdrive_secret
+from services.change_feed import key_change_notifier, wait_for_changes
+from services.key_filter import key_filter
 from models.user import User
 from repositories.interfaces import ApiKeyRepository
+from services.storage_usage_provider import storage_usage_provider
 import secrets
 import string
 from datetime import datetime
@@ -19,22 +23,24 @@ async def generate_api_key(
     current_user: User = Depends(auth_service.get_current_user),
     api_key_repo: ApiKeyRepository = Depends(get_api_key_repo_dep),
 ):
-    existing = await api_key_repo.get_by_owner_id(current_user.email)
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You already have an API key. Delete existing key to generate a new one.",
-        )
     access_key = generate_key(20)
     secret_key = generate_key(40)
     now = datetime.utcnow()
-    await api_key_repo.create(
+    created = await api_key_repo.create_if_owner_has_none(
         access_key,
         current_user.email,
         secret_key=secret_key,
         created_at=now,
         status="active",
     )
+    if not created:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already have an API key. Delete existing key to generate a new one.",
+        )
+    key_filter.add(access_key)
+    storage_usage_provider.invalidate(current_user.email)
+    key_change_notifier.notify()
     return {
         "access_key": access_key,
         "secret_key": secret_key,
@@ -49,9 +55,30 @@ async def delete_api_key(
     api_key_repo: ApiKeyRepository = Depends(get_api_key_repo_dep),
 ):
     deleted = await api_key_repo.delete_by_owner_id(current_user.email)
+    storage_usage_provider.invalidate(current_user.email)
+    key_change_notifier.notify()
     if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No API key found",
         )
     return {"message": "API key deleted successfully"}
+
+
+@router.get("/api-key-changes")
+async def api_key_changes(
+    cursor: Optional[int] = Query(None, ge=0, description="Last seq seen; omit to start from the current head"),
+    wait: float = Query(0, ge=0, description="Seconds to long-poll when there are no new events"),
+    limit: int = Query(500, ge=1, le=5000),
+    _service: None = Depends(require_warpdrive_secret),
+    api_key_repo: ApiKeyRepository = Depends(get_api_key_repo_dep),
+):
+    """
+    For Warpdrive only: key creation/deletion events after `cursor`, oldest first.
+    Pass the returned `cursor` on the next call; after a reconnect, resuming from the last
+    cursor replays everything missed, so cached credentials can be invalidated by push.
+    """
+    if cursor is None:
+        return {"events": [], "cursor": await api_key_repo.latest_change_seq()}
+    events = await wait_for_changes(cursor, wait, limit)
+    return {"events": events, "cursor": events[-1]["seq"] if events else cursor}
@@ -1,9 +1,12 @@
+import asyncio
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import BaseModel, EmailStr
 
-from config import Settings
+from config import get_settings
+from core.http_cache import etag_matches, make_etag, not_modified, set_etag
+from core.responses import FastJSONResponse
 from models.user import User
 from repositories.interfaces import UserRepository, ApiKeyRepository
 from services.auth import (
@@ -11,13 +14,17 @@ from services.auth import (
     get_user_repo_dep,
     get_api_key_repo_dep,
     hash_password,
+    needs_rehash,
+    require_warpdrive_secret,
     verify_password,
 )
+from services.credentials import CredentialBundle, MissingSecret, build_bundle, bundle_version, get_active_key
 from services.default_bucket import ensure_default_bucket
 
 logging.basicConfig(level=logging.DEBUG)
 
 router = APIRouter()
+settings = get_settings()
 
 
 class GoogleToken(BaseModel):
@@ -52,17 +59,14 @@ async def google_login(
 ):
     user_info = await auth_service.verify_google_token(token_data.token)
     email = user_info["email"]
-    user_row = await user_repo.get_by_email(email)
-
-    if not user_row:
-        user = User(
-            email=email,
-            google_id=user_info["sub"],
-            full_name=user_info.get("name", ""),
-            picture=user_info.get("picture"),
-            auth_provider="google",
-        )
-        await user_repo.create(user.to_row())
+    user = User(
+        email=email,
+        google_id=user_info["sub"],
+        full_name=user_info.get("name", ""),
+        picture=user_info.get("picture"),
+        auth_provider="google",
+    )
+    if await user_repo.create_if_absent(user.to_row()):
         await ensure_default_bucket(email)
     else:
         await user_repo.update(
@@ -83,19 +87,17 @@ async def register(
     body: RegisterRequest,
     user_repo: UserRepository = Depends(get_user_repo_dep),
 ):
-    existing = await user_repo.get_by_email(body.email)
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
     user = User(
         email=body.email,
         full_name=body.full_name or body.email.split("@")[0],
-        password_hash=hash_password(body.password),
+        password_hash=await asyncio.to_thread(hash_password, body.password),
         auth_provider="email",
     )
-    await user_repo.create(user.to_row())
+    if not await user_repo.create_if_absent(user.to_row()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
     await ensure_default_bucket(body.email)
     access_token = auth_service.create_access_token({"sub": body.email})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -112,17 +114,30 @@ async def login(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
-    if not verify_password(body.password, user_row["password_hash"]):
+    # bcrypt takes BCRYPT_TARGET_MS of CPU by design; keep it off the event loop.
+    if not await asyncio.to_thread(verify_password, body.password, user_row["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
+    if needs_rehash(user_row["password_hash"]):
+        new_hash = await asyncio.to_thread(hash_password, body.password)
+        await user_repo.update(body.email, {"password_hash": new_hash})
     access_token = auth_service.create_access_token({"sub": body.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/me")
-async def get_me(current_user: User = Depends(auth_service.get_current_user)):
+async def get_me(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    # Every profile change goes through UserRepository.update, which bumps updated_at.
+    etag = make_etag("me", current_user.email, current_user.updated_at.isoformat())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return current_user
 
 
@@ -144,33 +159,37 @@ async def get_api_keys(
     }
 
 
-@router.post("/s3-credentials")
+@router.post("/s3-credentials", response_model=CredentialBundle)
 async def s3_credentials(
     body: ValidateKeyRequest,
-    x_warpdrive_secret: str = Header(..., alias="X-Warpdrive-Secret"),
-    api_key_repo: ApiKeyRepository = Depends(get_api_key_repo_dep),
+    request: Request,
+    _service: None = Depends(require_warpdrive_secret),
 ):
     """
     For Warpdrive only: return owner_id and secret_key for SigV4 verification.
     Called by Warpdrive for every S3 request: Warpdrive sends the client's access_key
     and X-Warpdrive-Secret; we return the secret_key so Warpdrive can verify the signature.
+
+    The bundle carries a version (also sent as ETag) and max_age. Warpdrive may cache it
+    for max_age seconds, then revalidate with If-None-Match: an unchanged key answers 304
+    with no body (and no secret).
     """
-    settings = Settings()
-    if not settings.warpdrive_service_secret or settings.warpdrive_service_secret != x_warpdrive_secret:
+    try:
+        key_row = await get_active_key(body.access_key)
+    except MissingSecret:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or missing service secret",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Key has no stored secret; generate a new key",
         )
-    key_row = await api_key_repo.get_by_access_key(body.access_key)
-    if not key_row or key_row.get("status") != "active":
+    if not key_row:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or inactive key",
         )
-    secret_key = key_row.get("secret_key")
-    if not secret_key:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Key has no stored secret; generate a new key",
-        )
-    return {"owner_id": key_row["owner_id"], "secret_key": secret_key}
+    version = await bundle_version(key_row)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={settings.credentials_max_age_seconds}"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    bundle = await build_bundle(key_row, version)
+    return FastJSONResponse(bundle.model_dump(), headers=headers)
@@ -1,11 +1,16 @@
 """Bucket and usage endpoints. Bucket metadata from Console DB; stats from Warpdrive."""
 import re
-from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, Field
-from services.auth import auth_service
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import BaseModel, Field, TypeAdapter
+from core.http_cache import etag_matches, make_etag, not_modified, set_etag
+from core.responses import prevalidated
+from services.auth import auth_service, require_warpdrive_secret
 from services.default_bucket import ensure_default_bucket
+from services.usage_history import UsageHistory, get_history
+from services.usage_ingest import UsageDelta, seed_new_bucket, usage_aggregator
+from services.policy_engine import ALLOWED, ALLOWED_OWNER, PolicyError, authorize, compile_policy
 from services.storage_usage_provider import (
     storage_usage_provider,
     BucketSummary,
@@ -19,6 +24,9 @@ router = APIRouter()
 # S3 bucket name rules: 3-63 chars, lowercase/numbers/hyphens, no double hyphen
 BUCKET_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]$")
 BUCKET_TYPES = ("general_purpose", "ai_training")
+# Names taken by fixed GET routes under /api/buckets/, which a bucket of that name could never reach.
+RESERVED_BUCKET_NAMES = ("usage",)
+BUCKET_LIST_ADAPTER = TypeAdapter(List[BucketSummary])
 
 
 def _validate_bucket_name(name: str) -> None:
@@ -30,6 +38,12 @@ def _validate_bucket_name(name: str) -> None:
         raise HTTPException(400, "Bucket name cannot contain consecutive hyphens or start/end with a hyphen")
     if not BUCKET_NAME_PATTERN.match(name):
         raise HTTPException(400, "Bucket name must be lowercase letters, numbers, hyphens, or dots only")
+    if name in RESERVED_BUCKET_NAMES:
+        raise HTTPException(400, f"Bucket name {name!r} is reserved")
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
 
 
 class CreateBucketRequest(BaseModel):
@@ -38,6 +52,27 @@ class CreateBucketRequest(BaseModel):
     access_policies: Optional[str] = None
 
 
+class AuthorizationRequest(BaseModel):
+    principal: str
+    owner_id: str
+    bucket: str
+    action: str
+    key: str = ""
+
+
+class AuthorizeBatch(BaseModel):
+    requests: List[AuthorizationRequest] = Field(..., max_length=1000)
+
+
+class UsageDeltaBatch(BaseModel):
+    deltas: List[UsageDelta] = Field(..., max_length=10000)
+
+
+class AuthorizationDecision(BaseModel):
+    allowed: bool
+    reason: str
+
+
 class BucketCreated(BaseModel):
     name: str
     type: str
@@ -47,11 +82,24 @@ class BucketCreated(BaseModel):
 
 @router.get("/", response_model=list[BucketSummary])
 async def list_buckets(
+    request: Request,
     current_user: User = Depends(auth_service.get_current_user),
 ):
-    """List buckets for the current user (from Console DB, enriched with Warpdrive stats)."""
+    """
+    List buckets for the current user (from Console DB, enriched with Warpdrive stats).
+    If-None-Match is answered without a Warpdrive call only while the owner's stats are cached.
+    """
+    version = await storage_usage_provider.get_version(current_user.email)
+    if version is not None and etag_matches(request, make_etag("buckets", version)):
+        return not_modified(make_etag("buckets", version))
     await ensure_default_bucket(current_user.email)
-    return await storage_usage_provider.list_buckets(current_user.email)
+    buckets = await storage_usage_provider.list_buckets(current_user.email)
+    version = version or await storage_usage_provider.get_version(current_user.email)
+    # The provider already built BucketSummary models; skip response_model re-validation.
+    response = prevalidated(buckets, BUCKET_LIST_ADAPTER)
+    if version is not None:
+        set_etag(response, make_etag("buckets", version))
+    return response
 
 
 @router.post("/", response_model=BucketCreated, status_code=201)
@@ -63,24 +111,126 @@ async def create_bucket(
     _validate_bucket_name(body.name)
     if body.type not in BUCKET_TYPES:
         raise HTTPException(400, f"type must be one of: {', '.join(BUCKET_TYPES)}")
-    repo = get_bucket_repo()
-    existing = await repo.get_by_owner_and_name(current_user.email, body.name)
-    if existing:
-        raise HTTPException(409, "A bucket with this name already exists")
+    if body.access_policies:
+        try:
+            compile_policy(body.access_policies, body.name)
+        except PolicyError as e:
+            raise HTTPException(400, f"Invalid access_policies: {e}")
     now = datetime.utcnow().isoformat()
-    await repo.create({
+    created = await get_bucket_repo().create_if_absent({
         "bucket_name": body.name,
         "owner_id": current_user.email,
         "access_policies": body.access_policies,
         "type": body.type,
         "created_at": now,
     })
+    if not created:
+        raise HTTPException(409, "A bucket with this name already exists")
+    await seed_new_bucket(current_user.email, body.name)
     return BucketCreated(name=body.name, type=body.type, access_policies=body.access_policies, created_at=now)
 
 
 @router.get("/usage", response_model=UsageSummary)
 async def get_usage(
+    request: Request,
+    response: Response,
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """Get storage usage for the current user (read-only; data from Warpdrive)."""
-    return await storage_usage_provider.get_usage(current_user.email)
+    version = await storage_usage_provider.get_version(current_user.email)
+    if version is not None and etag_matches(request, make_etag("usage", version)):
+        return not_modified(make_etag("usage", version))
+    usage = await storage_usage_provider.get_usage(current_user.email)
+    version = version or await storage_usage_provider.get_version(current_user.email)
+    if version is not None:
+        set_etag(response, make_etag("usage", version))
+    return usage
+
+
+@router.get("/usage/history", response_model=UsageHistory)
+async def get_usage_history(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: Optional[str] = None,
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Usage over time for the current user (or one of their buckets), default the last 7 days.
+    The resolution (raw, hour or day) is chosen from the range so long charts stay small.
+    Samples are recorded when stats are fetched from Warpdrive (a dashboard view), or on
+    counter flushes with STORAGE_USAGE_SOURCE=counters; idle owners have gaps.
+    """
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(days=7)
+    if start > end:
+        raise HTTPException(400, "start must not be after end")
+    return await get_history(current_user.email, start, end, bucket)
+
+
+@router.post("/authorize")
+async def authorize_requests(
+    body: AuthorizeBatch,
+    _service: None = Depends(require_warpdrive_secret),
+):
+    """
+    For Warpdrive only: may `principal` perform `action` on `key` in `owner_id`'s `bucket`?
+    Decisions come back in request order; reason is owner, allow, deny, default or no_such_bucket.
+    """
+    repo = get_bucket_repo()
+    rows: dict = {}
+    decisions = []
+    for req in body.requests:
+        bucket_id = (req.owner_id, req.bucket)
+        if bucket_id not in rows:
+            rows[bucket_id] = await repo.get_by_owner_and_name(req.owner_id, req.bucket)
+        row = rows[bucket_id]
+        if row is None:
+            decisions.append(AuthorizationDecision(allowed=False, reason="no_such_bucket"))
+            continue
+        reason = authorize(row, req.principal, req.action, req.key)
+        decisions.append(AuthorizationDecision(allowed=reason in (ALLOWED, ALLOWED_OWNER), reason=reason))
+    return {"decisions": decisions}
+
+
+@router.post("/usage/deltas", status_code=202)
+async def ingest_usage_deltas(
+    body: UsageDeltaBatch,
+    _service: None = Depends(require_warpdrive_secret),
+):
+    """
+    For Warpdrive only: object count and size changes per bucket, e.g. +1/+size on put and
+    -1/-size on delete. Buffered and written in batches, so totals lag by up to
+    USAGE_INGEST_FLUSH_SECONDS. 503 means the buffer is full; retry after a second.
+    """
+    if not usage_aggregator.add(body.deltas):
+        raise HTTPException(503, "Usage ingestion backlog is full", headers={"Retry-After": "1"})
+    return {"accepted": len(body.deltas)}
+
+
+# Declared last so the fixed paths above (/usage, /usage/history) take precedence.
+@router.get("/{name}", response_model=BucketSummary)
+async def get_bucket(
+    name: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    One bucket with its stats: a single-row read and, when not cached, a single-bucket
+    Warpdrive call. While the owner's stats are cached, If-None-Match is answered from
+    their version without either; otherwise the ETag is derived from the result.
+    """
+    version = await storage_usage_provider.get_version(current_user.email)
+    if version is not None and etag_matches(request, make_etag("bucket", name, version)):
+        return not_modified(make_etag("bucket", name, version))
+    bucket = await storage_usage_provider.get_bucket(current_user.email, name)
+    if bucket is None:
+        raise HTTPException(404, "Bucket not found")
+    if version is not None:
+        etag = make_etag("bucket", name, version)
+    else:
+        etag = make_etag("bucket", *bucket.model_dump().values())
+        if etag_matches(request, etag):
+            return not_modified(etag)
+    set_etag(response, etag)
+    return bucket
@@ -0,0 +1,74 @@
+"""
+Local fault-injecting stand-in for Warpdrive's stats API, for exercising the
+circuit breaker and deadlines without a real Warpdrive.
+
+    python scripts/warpdrive_stub.py --port 9710 --latency 2 --failure-rate 0.5
+
+Then point the backend at it with WARPDRIVE_URL=http://localhost:9710. SigV4 headers
+are accepted but not verified. Every bucket name in --buckets reports fixed stats, both
+in the listing (GET /s3) and individually (GET /s3/{bucket}?stats; 501 with
+--no-bucket-stats, to exercise the Console's fallback to the listing).
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+def make_handler(args: argparse.Namespace):
+    buckets = [
+        {"name": name, "object_count": 10 * (i + 1), "total_size": 1_048_576 * (i + 1)}
+        for i, name in enumerate(args.buckets.split(","))
+        if name
+    ]
+    by_name = {b["name"]: b for b in buckets}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if args.latency:
+                time.sleep(args.latency)
+            if random.random() < args.failure_rate:
+                self.send_error(args.failure_status, "Injected failure")
+                return
+            path = self.path.split("?")[0].rstrip("/")
+            if path == "/s3":
+                body = json.dumps({"buckets": buckets}).encode("utf-8")
+            elif path.startswith("/s3/") and "stats" in self.path.partition("?")[2]:
+                if args.no_bucket_stats:
+                    self.send_error(501)
+                    return
+                bucket = by_name.get(unquote(path[len("/s3/"):]))
+                if bucket is None:
+                    self.send_error(404)
+                    return
+                body = json.dumps(bucket).encode("utf-8")
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9710)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to sleep before answering")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests that fail (0-1)")
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--buckets", default="default", help="comma-separated bucket names to report")
+    parser.add_argument("--no-bucket-stats", action="store_true", help="answer GET /s3/{bucket}?stats with 501")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args))
+    print(f"Warpdrive stub on http://127.0.0.1:{args.port} (latency={args.latency}s, failure_rate={args.failure_rate})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Production server. Run from backend/:  python serve.py
+
+Imports the app once in the master process, then forks SERVER_WORKERS workers (0 = one
+per CPU) that share its memory copy-on-write. Each worker binds its own listening socket
+with SO_REUSEPORT so the kernel spreads connections across them; where SO_REUSEPORT is
+not available the workers share one socket bound by the master. The master restarts
+workers that die and passes SIGTERM/SIGINT on for a graceful shutdown.
+
+uvloop and httptools are used when installed (`pip install uvloop httptools`), otherwise
+asyncio and h11. Keep-alive, backlog, graceful shutdown and access logging come from the
+SERVER_* settings. The master applies the database migrations before forking, so the
+workers start against an up-to-date schema instead of racing to migrate it. Rate limits
+and caches are per worker, and so, deliberately, is the loop monitor: each worker has its
+own event loop and must report its own stalls. State that must be seen by every worker
+lives outside process memory: request profiles in PROFILING_DIR, and backup file names
+carry the process id. The maintenance task and the credential socket run in worker 0
+only (config.worker_id).
+"""
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from importlib.util import find_spec
+from typing import Dict, Optional
+
+import uvicorn
+
+from config import WORKER_ID_ENV, Settings, get_settings
+
+logger = logging.getLogger("serve")
+
+REUSE_PORT = hasattr(socket, "SO_REUSEPORT")
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+async def _migrate() -> None:
+    from core.database import close_sqlite, init_sqlite
+
+    await init_sqlite()
+    await close_sqlite()
+
+
+def _bind(settings: Settings, reuse_port: bool) -> socket.socket:
+    family, kind, proto, _, address = socket.getaddrinfo(
+        settings.server_host, settings.server_port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+    )[0]
+    sock = socket.socket(family, kind, proto)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(address)
+    sock.listen(settings.server_backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _implementations() -> tuple:
+    loop = "uvloop" if find_spec("uvloop") else "asyncio"
+    http = "httptools" if find_spec("httptools") else "h11"
+    return loop, http
+
+
+def _serve(app, sock: socket.socket, settings: Settings, worker: int) -> None:
+    loop, http = _implementations()
+    config = uvicorn.Config(
+        app,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        backlog=settings.server_backlog,
+        timeout_keep_alive=int(settings.server_keepalive_seconds),
+        timeout_graceful_shutdown=int(settings.server_graceful_timeout_seconds),
+        access_log=settings.server_access_log,
+    )
+    logger.info("Worker %d (pid %d): event loop %s, HTTP parser %s", worker, os.getpid(), loop, http)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, settings: Settings, worker: int, shared: Optional[socket.socket]) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 0
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        os.environ[WORKER_ID_ENV] = str(worker)
+        sock = shared if shared is not None else _bind(settings, reuse_port=True)
+        _serve(app, sock, settings, worker)
+    except BaseException:
+        logger.exception("Worker %d crashed", worker)
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def _supervise(app, settings: Settings, workers: int) -> None:
+    shared = None if REUSE_PORT else _bind(settings, reuse_port=False)
+    children: Dict[int, int] = {}  # pid -> worker id
+    started: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        # Always SIGTERM: uvicorn treats a second SIGINT (Ctrl-C also reaches the workers
+        # through the process group) as a forced exit.
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker in range(workers):
+        pid = _spawn(app, settings, worker, shared)
+        children[pid] = worker
+        started[worker] = time.monotonic()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker = children.pop(pid, None)
+        if worker is None or stopping:
+            continue
+        logger.warning("Worker %d (pid %d) exited with status %d; restarting", worker, pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - started[worker] < RESTART_BACKOFF_SECONDS:
+            time.sleep(RESTART_BACKOFF_SECONDS)  # don't fork in a tight loop if it dies on startup
+        if stopping:
+            continue
+        pid = _spawn(app, settings, worker, shared)
+        children[pid] = worker
+        started[worker] = time.monotonic()
+    logger.info("All workers stopped")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    settings = get_settings()
+    workers = settings.server_workers or os.cpu_count() or 1
+
+    from main import app  # preload: imported once here, shared by every forked worker
+    from services.auth import configure_bcrypt
+
+    configure_bcrypt()  # once, so every worker hashes with the same cost
+
+    if workers == 1 or not hasattr(os, "fork"):
+        os.environ.setdefault(WORKER_ID_ENV, "0")
+        _serve(app, _bind(settings, reuse_port=False), settings, 0)
+        return
+
+    asyncio.run(_migrate())  # once, before any worker opens the database
+    # Move everything imported so far out of the collector's generations, so the workers'
+    # collections don't write to (and un-share) the pages they inherit.
+    gc.freeze()
+    logger.info(
+        "Serving on %s:%d with %d workers (%s)",
+        settings.server_host, settings.server_port, workers,
+        "SO_REUSEPORT" if REUSE_PORT else "shared socket",
+    )
+    _supervise(app, settings, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 from datetime import datetime, timedelta
 from typing import Optional, Dict
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
 from google.oauth2 import id_token
 from google.auth.transport import requests
 from jose import JWTError, jwt
 import bcrypt
+import hmac
+import time
 from config import Settings
 from core.database import get_user_repo, get_api_key_repo
 from models.user import User
 from repositories.interfaces import UserRepository, ApiKeyRepository
+from services.key_filter import key_filter
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
@@ -28,6 +31,18 @@ def get_api_key_repo_dep() -> ApiKeyRepository:
     return get_api_key_repo()
 
 
+def require_warpdrive_secret(
+    x_warpdrive_secret: str = Header(..., alias="X-Warpdrive-Secret"),
+) -> None:
+    """Dependency for Warpdrive-only endpoints: X-Warpdrive-Secret must match WARPDRIVE_SERVICE_SECRET."""
+    expected = settings.warpdrive_service_secret
+    if not expected or not hmac.compare_digest(expected.encode("utf-8"), x_warpdrive_secret.encode("utf-8")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing service secret",
+        )
+
+
 # Bcrypt accepts at most 72 bytes; truncate to avoid ValueError
 BCRYPT_MAX_PASSWORD_BYTES = 72
 
@@ -39,9 +54,78 @@ def _truncate_password_for_bcrypt(password: str) -> bytes:
     return encoded[:BCRYPT_MAX_PASSWORD_BYTES]
 
 
+# Timed cost for calibration: cheap to measure, and each extra round doubles the work.
+BCRYPT_PROBE_ROUNDS = 8
+
+_bcrypt_rounds: Optional[int] = None
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int, max_rounds: int) -> int:
+    """Highest cost whose hash takes at most `target_ms` on this machine (at least `min_rounds`)."""
+    # Best of three, so a scheduling hiccup doesn't lower the cost.
+    elapsed = min(_time_hash(BCRYPT_PROBE_ROUNDS) for _ in range(3)) * 1000
+    rounds = BCRYPT_PROBE_ROUNDS
+    while rounds < max_rounds and elapsed * 2 <= target_ms:
+        rounds += 1
+        elapsed *= 2
+    return max(min_rounds, min(rounds, max_rounds))
+
+
+def _time_hash(rounds: int) -> float:
+    started = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+    return time.perf_counter() - started
+
+
+def configure_bcrypt() -> int:
+    """
+    Pick the cost for new hashes: BCRYPT_ROUNDS if set, else calibrated against
+    BCRYPT_TARGET_MS. Runs once per process; serve.py calls it before forking so every
+    worker uses the same cost.
+    """
+    global _bcrypt_rounds
+    if _bcrypt_rounds is None:
+        if settings.bcrypt_min_rounds > settings.bcrypt_max_rounds:
+            raise ValueError(
+                f"BCRYPT_MIN_ROUNDS ({settings.bcrypt_min_rounds}) is greater than "
+                f"BCRYPT_MAX_ROUNDS ({settings.bcrypt_max_rounds})"
+            )
+        if settings.bcrypt_rounds:
+            _bcrypt_rounds = settings.bcrypt_rounds
+            logger.info(f"bcrypt cost {_bcrypt_rounds} (BCRYPT_ROUNDS)")
+        else:
+            _bcrypt_rounds = calibrate_bcrypt_rounds(
+                settings.bcrypt_target_ms, settings.bcrypt_min_rounds, settings.bcrypt_max_rounds
+            )
+            logger.info(f"bcrypt cost {_bcrypt_rounds} (calibrated for {settings.bcrypt_target_ms:g} ms per hash)")
+    return _bcrypt_rounds
+
+
+def bcrypt_cost(hashed: str) -> Optional[int]:
+    """Cost recorded in a "$2b$12$..." hash."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed: str) -> bool:
+    """
+    True if the hash is weaker than the current cost. A calibrated cost varies between
+    processes and hosts, so only a pinned BCRYPT_ROUNDS also lowers stronger hashes;
+    otherwise hosts with different calibrations would rehash each other's hashes forever.
+    """
+    cost = bcrypt_cost(hashed)
+    if cost is None:
+        return True
+    if settings.bcrypt_rounds:
+        return cost != configure_bcrypt()
+    return cost < configure_bcrypt()
+
+
 def hash_password(password: str) -> str:
     pw_bytes = _truncate_password_for_bcrypt(password)
-    return bcrypt.hashpw(pw_bytes, bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(pw_bytes, bcrypt.gensalt(configure_bcrypt())).decode("utf-8")
 
 
 def verify_password(plain: str, hashed: str) -> bool:
@@ -125,7 +209,7 @@ class AuthService:
         user_repo: UserRepository = Depends(get_user_repo_dep),
         api_key_repo: ApiKeyRepository = Depends(get_api_key_repo_dep),
     ) -> Optional[User]:
-        key_row = await api_key_repo.get_by_access_key(api_key)
+        key_row = await api_key_repo.get_by_access_key(api_key) if await key_filter.might_exist(api_key) else None
         if not key_row:
             logger.error("Invalid API key")
             raise HTTPException(
@@ -143,3 +227,13 @@ class AuthService:
 
 
 auth_service = AuthService()
+
+
+async def get_current_admin(current_user: User = Depends(auth_service.get_current_user)) -> User:
+    """Current user, restricted to the addresses listed in ADMIN_EMAILS."""
+    if current_user.email not in settings.admin_emails:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
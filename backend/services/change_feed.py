@@ -0,0 +1,49 @@
+"""
+Long-poll support for the API key change feed (api_key_changes table).
+
+Writers in this process call `key_change_notifier.notify()` so waiting consumers wake
+immediately; changes written by other worker processes are picked up by polling the
+table every CHANGE_FEED_POLL_SECONDS while a consumer waits.
+"""
+import asyncio
+import time
+from typing import List
+
+from config import get_settings
+from core.database import get_api_key_repo
+from repositories.interfaces import ApiKeyChangeRow
+
+
+class ChangeNotifier:
+    def __init__(self):
+        self._event = asyncio.Event()
+        # Bumped on every local change, so caches can tell their entries are stale.
+        self.generation = 0
+
+    def notify(self) -> None:
+        # Wake every current waiter, then re-arm for the next change.
+        self.generation += 1
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+key_change_notifier = ChangeNotifier()
+
+
+async def wait_for_changes(cursor: int, wait: float, limit: int) -> List[ApiKeyChangeRow]:
+    """Return changes after `cursor`, waiting up to `wait` seconds for the first one."""
+    settings = get_settings()
+    repo = get_api_key_repo()
+    give_up_at = time.monotonic() + min(wait, settings.change_feed_max_wait_seconds)
+    while True:
+        changes = await repo.list_changes(cursor, limit)
+        left = give_up_at - time.monotonic()
+        if changes or left <= 0:
+            return changes
+        await key_change_notifier.wait(min(left, settings.change_feed_poll_seconds))
@@ -0,0 +1,69 @@
+"""
+Credential bundles served to Warpdrive for SigV4 verification.
+
+A bundle carries a version so Warpdrive can cache it for `max_age` seconds and then
+revalidate with If-None-Match; the version covers the key row and the owner's bucket
+set, and is an HMAC so it reveals nothing about the secret it was derived from.
+"""
+import hashlib
+import hmac
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from config import get_settings
+from core.database import get_api_key_repo, get_bucket_repo
+from repositories.interfaces import ApiKeyRow
+from services.key_filter import key_filter
+
+
+class BundleBucket(BaseModel):
+    name: str
+    type: str
+
+
+class CredentialBundle(BaseModel):
+    owner_id: str
+    secret_key: str
+    version: str
+    max_age: int
+    buckets: List[BundleBucket]
+
+
+class MissingSecret(Exception):
+    """The key exists and is active but has no stored secret."""
+
+
+async def get_active_key(access_key: str) -> Optional[ApiKeyRow]:
+    if not await key_filter.might_exist(access_key):
+        return None
+    key_row = await get_api_key_repo().get_by_access_key(access_key)
+    if not key_row or key_row.get("status") != "active":
+        return None
+    if not key_row.get("secret_key"):
+        raise MissingSecret(access_key)
+    return key_row
+
+
+async def bundle_version(key_row: ApiKeyRow) -> str:
+    bucket_version = await get_bucket_repo().get_version(key_row["owner_id"])
+    material = "\x1f".join(
+        str(key_row.get(k)) for k in ("access_key", "owner_id", "secret_key", "status", "created_at")
+    ) + "\x1f" + bucket_version
+    digest = hmac.new(get_settings().secret_key.encode("utf-8"), material.encode("utf-8"), hashlib.sha256)
+    return digest.hexdigest()[:32]
+
+
+async def build_bundle(key_row: ApiKeyRow, version: Optional[str] = None) -> CredentialBundle:
+    owner_id = key_row["owner_id"]
+    bucket_rows = await get_bucket_repo().list_by_owner_id(owner_id)
+    return CredentialBundle(
+        owner_id=owner_id,
+        secret_key=key_row["secret_key"],
+        version=version or await bundle_version(key_row),
+        max_age=get_settings().credentials_max_age_seconds,
+        buckets=[
+            BundleBucket(name=row["bucket_name"], type=row.get("type") or "general_purpose")
+            for row in bucket_rows
+        ],
+    )
@@ -1,18 +1,26 @@
 """Ensure every user has a 'default' bucket (created on first use if missing)."""
 from datetime import datetime
+from typing import Set
 
 from core.database import get_bucket_repo
+from services.usage_ingest import seed_new_bucket
+
+# Owners whose default bucket this process has already ensured; buckets are never deleted,
+# so repeat calls (every bucket listing) skip the database entirely.
+_ensured: Set[str] = set()
 
 
 async def ensure_default_bucket(owner_id: str) -> None:
     """Create a bucket named 'default' for the owner if they have no buckets yet."""
-    bucket_repo = get_bucket_repo()
-    existing = await bucket_repo.get_by_owner_and_name(owner_id, "default")
-    if not existing:
-        await bucket_repo.create({
-            "bucket_name": "default",
-            "owner_id": owner_id,
-            "access_policies": None,
-            "type": "general_purpose",
-            "created_at": datetime.utcnow().isoformat(),
-        })
+    if owner_id in _ensured:
+        return
+    created = await get_bucket_repo().create_if_absent({
+        "bucket_name": "default",
+        "owner_id": owner_id,
+        "access_policies": None,
+        "type": "general_purpose",
+        "created_at": datetime.utcnow().isoformat(),
+    })
+    if created:
+        await seed_new_bucket(owner_id, "default")
+    _ensured.add(owner_id)
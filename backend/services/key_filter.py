@@ -0,0 +1,142 @@
+"""
+In-memory filter of every access key, so lookups of keys that were never issued
+(scanners, misconfigured clients) are rejected without touching SQLite.
+
+A counting Bloom filter: "absent" is always right, "maybe present" falls through to the
+database. It is built from api_keys at startup and follows the api_key_changes log, so
+deletions remove keys too. Keys created in this process are added immediately. Keys
+created by other workers reach it through the log: before answering "absent", the filter
+catches up on the log if it last did so more than KEY_FILTER_SYNC_SECONDS ago. Until the
+first build completes every key counts as "maybe present".
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import List, Optional, Set
+
+from config import get_settings
+from core.database import get_api_key_repo
+
+logger = logging.getLogger(__name__)
+
+MIN_CAPACITY = 10_000
+SYNC_BATCH = 5000
+
+
+class CountingBloomFilter:
+    """Byte counters (saturating at 255, after which they are never decremented)."""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._counters = bytearray(self.size)
+
+    def _indexes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        counters = self._counters
+        for i in self._indexes(key):
+            if counters[i] < 255:
+                counters[i] += 1
+
+    def remove(self, key: str) -> None:
+        counters = self._counters
+        indexes = self._indexes(key)
+        if not all(counters[i] for i in indexes):
+            return  # never added
+        for i in indexes:
+            if counters[i] < 255:
+                counters[i] -= 1
+
+    def __contains__(self, key: str) -> bool:
+        counters = self._counters
+        return all(counters[i] for i in self._indexes(key))
+
+
+class KeyFilter:
+    def __init__(self):
+        self._bloom: Optional[CountingBloomFilter] = None
+        self._count = 0
+        self._cursor = 0
+        self._synced_at = 0.0
+        self._added_locally: Set[str] = set()
+        self._lock = asyncio.Lock()
+
+    async def build(self) -> None:
+        settings = get_settings()
+        started = time.perf_counter()
+        keys, cursor = await get_api_key_repo().snapshot_access_keys()
+        bloom = CountingBloomFilter(max(MIN_CAPACITY, 2 * len(keys)), settings.key_filter_false_positive_rate)
+        for key in keys:
+            bloom.add(key)
+        self._bloom, self._count, self._cursor = bloom, len(keys), cursor
+        self._synced_at = time.monotonic()
+        self._added_locally.clear()
+        logger.info(
+            "Key filter: %d keys, %d KiB, built in %.2f s",
+            len(keys), bloom.size // 1024, time.perf_counter() - started,
+        )
+
+    async def sync(self) -> None:
+        """Apply key changes logged since the last build or sync."""
+        async with self._lock:
+            if time.monotonic() - self._synced_at < get_settings().key_filter_sync_seconds:
+                return  # another caller just synced
+            repo = get_api_key_repo()
+            while True:
+                changes = await repo.list_changes(self._cursor, SYNC_BATCH)
+                for change in changes:
+                    key = change["access_key"]
+                    if change["event"] == "created":
+                        if key in self._added_locally:
+                            self._added_locally.discard(key)
+                        else:
+                            self._bloom.add(key)
+                            self._count += 1
+                    else:
+                        self._added_locally.discard(key)
+                        self._bloom.remove(key)
+                        self._count -= 1
+                if changes:
+                    self._cursor = changes[-1]["seq"]
+                if len(changes) < SYNC_BATCH:
+                    break
+            self._synced_at = time.monotonic()
+            if self._count > self._bloom.capacity:
+                await self.build()  # grown past its sizing; the false-positive rate would climb
+
+    def add(self, access_key: str) -> None:
+        """Record a key this process just created; its log entry is skipped when it is replayed."""
+        if self._bloom is not None:
+            self._bloom.add(access_key)
+            self._count += 1
+            self._added_locally.add(access_key)
+
+    async def might_exist(self, access_key: str) -> bool:
+        """False only if the key certainly does not exist."""
+        if self._bloom is None or access_key in self._bloom:
+            return True
+        if time.monotonic() - self._synced_at < get_settings().key_filter_sync_seconds:
+            return False
+        await self.sync()
+        return access_key in self._bloom
+
+
+key_filter = KeyFilter()
+
+
+async def start_key_filter() -> None:
+    if not get_settings().key_filter_enabled:
+        return
+    try:
+        await key_filter.build()
+    except Exception:
+        # Without a filter every key is looked up in the database, exactly as before.
+        logger.exception("Key filter: build failed; unknown keys will be looked up in the database")
@@ -0,0 +1,215 @@
+"""
+Bucket access-policy evaluation.
+
+`buckets.access_policies` holds an S3-style JSON document:
+
+    {"Statement": [{"Effect": "Allow" | "Deny",
+                    "Principal": "*" | "user@example.com" | [...],
+                    "Action": "s3:GetObject" | "s3:Get*" | [...],
+                    "Resource": "public/*" | "arn:aws:s3:::bucket/public/*" | [...]}]}
+
+Resources are object-key patterns within the bucket; `*` and `?` are wildcards. The
+bucket ARN itself ("arn:aws:s3:::bucket") is the bucket-level resource, matched by an
+empty key (e.g. for s3:ListBucket). Actions match case-insensitively, as in IAM. The
+bucket owner is always allowed, an explicit Deny beats any Allow, and anything not
+allowed is denied. Other statement keys (Condition, NotPrincipal, NotAction, ...) are
+rejected rather than ignored: ignoring one would widen what the statement grants.
+
+Policies are compiled once per distinct text (cached by content hash) into bitmask
+matchers: each statement is one bit, trailing-`*` resources go into a prefix index
+(one hash lookup per distinct prefix length), exact resources into a dict, and the
+rare mid-pattern wildcards into precompiled regexes.
+"""
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_POLICIES = 10_000
+MAX_CACHED_LOOKUPS = 1_024
+STATEMENT_KEYS = frozenset({"Sid", "Effect", "Principal", "Action", "Resource"})
+
+ALLOWED_OWNER = "owner"
+ALLOWED = "allow"
+DENIED = "deny"
+DEFAULT_DENY = "default"
+
+
+class PolicyError(ValueError):
+    """The policy document is malformed."""
+
+
+def _as_list(value, field: str) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):  # {"AWS": [...]} style principals
+        return [v for vs in value.values() for v in _as_list(vs, field)]
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return value
+    raise PolicyError(f"{field} must be a string or a list of strings")
+
+
+def _wildcard_regex(pattern: str) -> str:
+    return "".join(".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern)
+
+
+class _PatternSet:
+    """Maps a string to the bitmask of statements with a pattern matching it."""
+
+    def __init__(self):
+        self.any = 0
+        self.exact: Dict[str, int] = {}
+        self.prefixes: Dict[int, Dict[str, int]] = {}
+        self._regex: List[Tuple[str, int]] = []
+        self.patterns: List[Tuple["re.Pattern[str]", int]] = []
+
+    def add(self, pattern: str, bit: int) -> None:
+        if pattern == "*":
+            self.any |= bit
+        elif "*" not in pattern and "?" not in pattern:
+            self.exact[pattern] = self.exact.get(pattern, 0) | bit
+        elif pattern.endswith("*") and "*" not in pattern[:-1] and "?" not in pattern:
+            prefix = pattern[:-1]
+            by_len = self.prefixes.setdefault(len(prefix), {})
+            by_len[prefix] = by_len.get(prefix, 0) | bit
+        else:
+            self._regex.append((pattern, bit))
+
+    def freeze(self) -> None:
+        self.patterns = [(re.compile(_wildcard_regex(p), re.DOTALL), bit) for p, bit in self._regex]
+        self._prefix_lengths = sorted(self.prefixes)
+
+    def match(self, value: str) -> int:
+        mask = self.any | self.exact.get(value, 0)
+        n = len(value)
+        for length in self._prefix_lengths:
+            if length > n:
+                break
+            mask |= self.prefixes[length].get(value[:length], 0)
+        for regex, bit in self.patterns:
+            if regex.fullmatch(value):
+                mask |= bit
+        return mask
+
+
+class CompiledPolicy:
+    def __init__(self, statements: Iterable[dict], bucket_name: str = ""):
+        self.allow_mask = 0
+        self.deny_mask = 0
+        self._principals = _PatternSet()
+        self._actions = _PatternSet()
+        self._resources = _PatternSet()
+        bucket_arn = f"arn:aws:s3:::{bucket_name}" if bucket_name else None
+        for i, st in enumerate(statements):
+            if not isinstance(st, dict):
+                raise PolicyError("Each statement must be an object")
+            unsupported = sorted(set(st) - STATEMENT_KEYS)
+            if unsupported:
+                raise PolicyError(f"Unsupported statement keys: {', '.join(unsupported)}")
+            bit = 1 << i
+            effect = st.get("Effect")
+            if effect == "Allow":
+                self.allow_mask |= bit
+            elif effect == "Deny":
+                self.deny_mask |= bit
+            else:
+                raise PolicyError("Effect must be Allow or Deny")
+            for p in _as_list(st.get("Principal", "*"), "Principal"):
+                self._principals.add(p, bit)
+            for a in _as_list(st.get("Action", []), "Action"):
+                self._actions.add(a.lower(), bit)
+            for r in _as_list(st.get("Resource", "*"), "Resource"):
+                if bucket_arn and r == bucket_arn:
+                    r = ""  # the bucket itself
+                elif bucket_arn and r.startswith(bucket_arn + "/"):
+                    r = r[len(bucket_arn) + 1:]
+                elif r.startswith("arn:aws:s3:::"):
+                    raise PolicyError(f"Resource {r!r} does not belong to this bucket")
+                self._resources.add(r, bit)
+        for s in (self._principals, self._actions, self._resources):
+            s.freeze()
+        # Principals and actions come from a small vocabulary, so their masks are memoized.
+        self._principal_cache: Dict[str, int] = {}
+        self._action_cache: Dict[str, int] = {}
+
+    def _cached(self, cache: Dict[str, int], patterns: _PatternSet, value: str) -> int:
+        mask = cache.get(value)
+        if mask is None:
+            mask = patterns.match(value)
+            if len(cache) >= MAX_CACHED_LOOKUPS:
+                cache.clear()
+            cache[value] = mask
+        return mask
+
+    def evaluate(self, principal: str, action: str, key: str) -> str:
+        candidates = self.allow_mask | self.deny_mask
+        candidates &= self._cached(self._action_cache, self._actions, action.lower())
+        if candidates:
+            candidates &= self._cached(self._principal_cache, self._principals, principal)
+        if candidates:
+            candidates &= self._resources.match(key)
+        if candidates & self.deny_mask:
+            return DENIED
+        if candidates & self.allow_mask:
+            return ALLOWED
+        return DEFAULT_DENY
+
+
+def compile_policy(text: Optional[str], bucket_name: str = "") -> CompiledPolicy:
+    """Parse and compile a policy document; raises PolicyError if it is malformed."""
+    if not text or not text.strip():
+        return CompiledPolicy([], bucket_name)
+    try:
+        doc = json.loads(text)
+    except ValueError as e:
+        raise PolicyError(f"Policy is not valid JSON: {e}") from e
+    statements = doc.get("Statement") if isinstance(doc, dict) else None
+    if isinstance(statements, dict):
+        statements = [statements]
+    if not isinstance(statements, list):
+        raise PolicyError("Policy must contain a Statement list")
+    return CompiledPolicy(statements, bucket_name)
+
+
+class PolicyCache:
+    """
+    Compiled policies keyed by (bucket name, SHA-256 of the policy text), bounded LRU.
+    Keys stay small however long the policies are; an edited policy simply misses and
+    compiles anew.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHED_POLICIES):
+        self._entries: "OrderedDict[Tuple[str, bytes], CompiledPolicy]" = OrderedDict()
+        self._max_entries = max_entries
+
+    def get(self, bucket_name: str, text: Optional[str]) -> CompiledPolicy:
+        key = (bucket_name, hashlib.sha256((text or "").encode("utf-8")).digest())
+        compiled = self._entries.get(key)
+        if compiled is not None:
+            self._entries.move_to_end(key)
+            return compiled
+        try:
+            compiled = compile_policy(text, bucket_name)
+        except PolicyError as e:
+            # Stored before policies were validated: grant nothing beyond the owner.
+            logger.warning("Ignoring unparseable access policy on bucket %s: %s", bucket_name, e)
+            compiled = CompiledPolicy([], bucket_name)
+        self._entries[key] = compiled
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return compiled
+
+
+policy_cache = PolicyCache()
+
+
+def authorize(bucket_row: dict, principal: str, action: str, key: str) -> str:
+    """Decision for one request against a bucket row: owner, allow, deny or default."""
+    if principal == bucket_row["owner_id"]:
+        return ALLOWED_OWNER
+    compiled = policy_cache.get(bucket_row["bucket_name"], bucket_row.get("access_policies"))
+    return compiled.evaluate(principal, action, key)
@@ -1,15 +1,25 @@
 """
-Storage usage: bucket list from Console DB + Warpdrive; object_count/total_size from Warpdrive.
+Storage usage: bucket list from Console DB; object_count/total_size from Warpdrive, either
+fetched on demand (STORAGE_USAGE_SOURCE=warpdrive) or from the counters Warpdrive pushes
+deltas into (STORAGE_USAGE_SOURCE=counters, see services.usage_ingest).
 """
-import asyncio
+import hashlib
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 from pydantic import BaseModel
 
-from core.database import get_bucket_repo, get_api_key_repo
-from services.warpdrive_client import get_warpdrive_url, list_buckets_with_stats_sync
+from core.database import get_bucket_counter_repo, get_bucket_repo, get_api_key_repo
+from services.usage_history import record_snapshot
+from services.warpdrive_client import (
+    WarpdriveNotSupported,
+    WarpdriveUnavailable,
+    get_bucket_stats,
+    get_warpdrive_url,
+    list_buckets_with_stats,
+)
 from config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -21,12 +31,14 @@ class BucketSummary(BaseModel):
     total_size: int = 0
     type: str = "general_purpose"
     access_policies: Optional[str] = None
+    stats_available: bool = True
 
 
 class UsageSummary(BaseModel):
     storage_used: int = 0
     storage_quota: int = 0
     object_count: int = 0
+    stats_available: bool = True
 
 
 class StorageUsageProvider(ABC):
@@ -38,43 +50,126 @@ class StorageUsageProvider(ABC):
     async def get_usage(self, owner_id: str) -> UsageSummary:
         pass
 
+    async def get_bucket(self, owner_id: str, bucket_name: str) -> Optional[BucketSummary]:
+        """One bucket with stats, or None if the owner has no such bucket."""
+        for bucket in await self.list_buckets(owner_id):
+            if bucket.name == bucket_name:
+                return bucket
+        return None
+
+    async def get_version(self, owner_id: str) -> Optional[str]:
+        """
+        Cheap marker that changes whenever list_buckets/get_usage output may change.
+        None means the version is unknown without recomputing (e.g. stats not cached).
+        """
+        return None
+
+    def invalidate(self, owner_id: str) -> None:
+        """Drop any cached data for the owner (e.g. after their API key changed)."""
+
 
 def _default_quota_bytes() -> int:
     return 5 * 1024 * 1024 * 1024  # 5 GB
 
 
+class _StatsEntry(NamedTuple):
+    fetched_at: float
+    stats_by_name: Dict[str, Tuple[int, int]]
+    digest: str
+    available: bool = True
+
+
+_NO_STATS = _StatsEntry(0.0, {}, "none")
+
+
+# After Warpdrive reports no per-bucket stats call, use the listing for this long before retrying.
+BUCKET_STATS_RETRY_SECONDS = 600.0
+# Owners whose Warpdrive stats are kept at most; expired entries go first, then the oldest.
+STATS_CACHE_MAX_ENTRIES = 10_000
+
+
+def _stats_digest(stats_by_name: Dict[str, Tuple[int, int]]) -> str:
+    return hashlib.sha1(repr(sorted(stats_by_name.items())).encode("utf-8")).hexdigest()[:16]
+
+
 class ConsoleWarpdriveStorageUsageProvider(StorageUsageProvider):
     """List buckets from Console DB; enrich object_count/total_size from Warpdrive GET /s3/."""
 
+    def __init__(self):
+        # owner_id -> last Warpdrive stats; reused for warpdrive_stats_ttl_seconds
+        self._stats_cache: Dict[str, _StatsEntry] = {}
+        # Set when Warpdrive reports it has no per-bucket stats call; the listing is used until then.
+        self._bucket_stats_retry_at = 0.0
+
+    def _fresh_stats(self, owner_id: str) -> Optional[_StatsEntry]:
+        if not get_warpdrive_url():
+            return _NO_STATS
+        entry = self._stats_cache.get(owner_id)
+        if entry and time.monotonic() - entry.fetched_at < get_settings().warpdrive_stats_ttl_seconds:
+            return entry
+        return None
+
+    async def _get_stats(self, owner_id: str) -> _StatsEntry:
+        entry = self._fresh_stats(owner_id)
+        if entry is not None:
+            return entry
+
+        stats_by_name: Dict[str, Tuple[int, int]] = {}
+        api_key_repo = get_api_key_repo()
+        key_row = await api_key_repo.get_by_owner_id(owner_id)
+        if not key_row:
+            logger.warning(
+                "Storage usage: no API key for owner_id=%s (create one in Developer Settings), bucket stats will be 0",
+                owner_id[:16],
+            )
+        else:
+            try:
+                warpdrive_buckets = await list_buckets_with_stats(key_row["access_key"], key_row["secret_key"])
+            except WarpdriveUnavailable as e:
+                # Degraded answer, not cached: the next request retries (or fails fast while the breaker is open).
+                logger.warning("Storage usage: Warpdrive unavailable (%s), stats marked unavailable", e)
+                return _StatsEntry(time.monotonic(), {}, "unavailable", available=False)
+            stats_by_name = {
+                b["name"]: (b["object_count"], b["total_size"])
+                for b in warpdrive_buckets
+            }
+            await record_snapshot(owner_id, stats_by_name)
+        entry = _StatsEntry(time.monotonic(), stats_by_name, _stats_digest(stats_by_name))
+        self._remember(owner_id, entry)
+        return entry
+
+    def _remember(self, owner_id: str, entry: _StatsEntry) -> None:
+        cache = self._stats_cache
+        cache.pop(owner_id, None)  # re-insert so dict order stays oldest-first
+        if len(cache) >= STATS_CACHE_MAX_ENTRIES:
+            ttl = get_settings().warpdrive_stats_ttl_seconds
+            now = time.monotonic()
+            for stale in [k for k, e in cache.items() if now - e.fetched_at >= ttl]:
+                del cache[stale]
+            while len(cache) >= STATS_CACHE_MAX_ENTRIES:
+                del cache[next(iter(cache))]
+        cache[owner_id] = entry
+
+    async def get_version(self, owner_id: str) -> Optional[str]:
+        # Only known while the owner's stats are cached (WARPDRIVE_STATS_TTL_SECONDS): a
+        # stale digest could vouch for stats that changed in Warpdrive. After that a
+        # conditional request still fetches, and its ETag only saves sending the body.
+        entry = self._fresh_stats(owner_id)
+        if entry is None:
+            return None
+        bucket_version = await get_bucket_repo().get_version(owner_id)
+        return f"{bucket_version}:{entry.digest}"
+
+    def invalidate(self, owner_id: str) -> None:
+        self._stats_cache.pop(owner_id, None)
+
     async def list_buckets(self, owner_id: str) -> List[BucketSummary]:
         bucket_repo = get_bucket_repo()
         console_buckets = await bucket_repo.list_by_owner_id(owner_id)
-        stats_by_name: dict[str, tuple[int, int]] = {}
-
-        warpdrive_url = get_warpdrive_url()
-        if not warpdrive_url:
+        if not get_warpdrive_url():
             logger.info("Storage usage: WARPDRIVE_URL not set, bucket stats will be 0")
-        else:
-            api_key_repo = get_api_key_repo()
-            key_row = await api_key_repo.get_by_owner_id(owner_id)
-            if not key_row:
-                logger.warning(
-                    "Storage usage: no API key for owner_id=%s (create one in Developer Settings), bucket stats will be 0",
-                    owner_id[:16],
-                )
-            else:
-                loop = asyncio.get_event_loop()
-                warpdrive_buckets = await loop.run_in_executor(
-                    None,
-                    lambda: list_buckets_with_stats_sync(
-                        key_row["access_key"],
-                        key_row["secret_key"],
-                    ),
-                )
-                stats_by_name = {
-                    b["name"]: (b["object_count"], b["total_size"])
-                    for b in warpdrive_buckets
-                }
+        stats = await self._get_stats(owner_id)
+        stats_by_name = stats.stats_by_name
 
         result: List[BucketSummary] = []
         for row in console_buckets:
@@ -87,20 +182,109 @@ class ConsoleWarpdriveStorageUsageProvider(StorageUsageProvider):
                     total_size=total_size,
                     type=row.get("type") or "general_purpose",
                     access_policies=row.get("access_policies"),
+                    stats_available=stats.available,
                 )
             )
         return result
 
+    async def _get_one_stats(self, owner_id: str, bucket_name: str) -> Tuple[Tuple[int, int], bool]:
+        """((object_count, total_size), available) for one bucket, fetching only that bucket if possible."""
+        entry = self._fresh_stats(owner_id)
+        if entry is None and time.monotonic() < self._bucket_stats_retry_at:
+            entry = await self._get_stats(owner_id)
+        if entry is None:
+            key_row = await get_api_key_repo().get_by_owner_id(owner_id)
+            if not key_row:
+                return (0, 0), True
+            try:
+                stats = await get_bucket_stats(key_row["access_key"], key_row["secret_key"], bucket_name)
+                return (stats["object_count"], stats["total_size"]), True
+            except WarpdriveNotSupported as e:
+                logger.info("Storage usage: %s, using the bucket listing for single-bucket stats", e)
+                self._bucket_stats_retry_at = time.monotonic() + BUCKET_STATS_RETRY_SECONDS
+                entry = await self._get_stats(owner_id)
+            except WarpdriveUnavailable as e:
+                logger.warning("Storage usage: Warpdrive unavailable (%s), stats marked unavailable", e)
+                return (0, 0), False
+        return entry.stats_by_name.get(bucket_name, (0, 0)), entry.available
+
+    async def get_bucket(self, owner_id: str, bucket_name: str) -> Optional[BucketSummary]:
+        row = await get_bucket_repo().get_by_owner_and_name(owner_id, bucket_name)
+        if row is None:
+            return None
+        (obj_count, total_size), available = await self._get_one_stats(owner_id, bucket_name)
+        return BucketSummary(
+            name=bucket_name,
+            object_count=obj_count,
+            total_size=total_size,
+            type=row.get("type") or "general_purpose",
+            access_policies=row.get("access_policies"),
+            stats_available=available,
+        )
+
     async def get_usage(self, owner_id: str) -> UsageSummary:
-        buckets = await self.list_buckets(owner_id)
-        storage_used = sum(b.total_size for b in buckets)
-        object_count = sum(b.object_count for b in buckets)
-        quota = getattr(get_settings(), "storage_quota_bytes", None) or _default_quota_bytes()
-        return UsageSummary(
-            storage_used=storage_used,
-            storage_quota=quota,
-            object_count=object_count,
+        return _summarize(await self.list_buckets(owner_id))
+
+
+class CountersStorageUsageProvider(StorageUsageProvider):
+    """
+    List buckets from Console DB; object_count/total_size from the local bucket_counters table.
+    A bucket without a counter row (one that existed before counting started and has had no
+    delta or seed since) has no known baseline, so its stats are reported as unavailable.
+    """
+
+    def _summary(self, row: dict, counts: Optional[Tuple[int, int]]) -> BucketSummary:
+        return BucketSummary(
+            name=row["bucket_name"],
+            object_count=counts[0] if counts else 0,
+            total_size=counts[1] if counts else 0,
+            type=row.get("type") or "general_purpose",
+            access_policies=row.get("access_policies"),
+            stats_available=counts is not None,
         )
 
+    async def list_buckets(self, owner_id: str) -> List[BucketSummary]:
+        console_buckets = await get_bucket_repo().list_by_owner_id(owner_id)
+        counts = await get_bucket_counter_repo().get_by_owner_id(owner_id)
+        return [self._summary(row, counts.get(row["bucket_name"])) for row in console_buckets]
+
+    async def get_bucket(self, owner_id: str, bucket_name: str) -> Optional[BucketSummary]:
+        row = await get_bucket_repo().get_by_owner_and_name(owner_id, bucket_name)
+        if row is None:
+            return None
+        return self._summary(row, await get_bucket_counter_repo().get(owner_id, bucket_name))
+
+    async def get_usage(self, owner_id: str) -> UsageSummary:
+        return _summarize(await self.list_buckets(owner_id))
+
+    async def get_version(self, owner_id: str) -> Optional[str]:
+        bucket_version = await get_bucket_repo().get_version(owner_id)
+        counts = await get_bucket_counter_repo().get_by_owner_id(owner_id)
+        return f"{bucket_version}:{_stats_digest(counts)}"
+
+
+def _summarize(buckets: List[BucketSummary]) -> UsageSummary:
+    quota = getattr(get_settings(), "storage_quota_bytes", None) or _default_quota_bytes()
+    return UsageSummary(
+        storage_used=sum(b.total_size for b in buckets),
+        storage_quota=quota,
+        object_count=sum(b.object_count for b in buckets),
+        # all([]) is True; with no buckets there are no stats to vouch for.
+        stats_available=bool(buckets) and all(b.stats_available for b in buckets),
+    )
+
+
+STORAGE_USAGE_SOURCES = {
+    "warpdrive": ConsoleWarpdriveStorageUsageProvider,
+    "counters": CountersStorageUsageProvider,
+}
+
+
+def _make_provider() -> StorageUsageProvider:
+    source = get_settings().storage_usage_source
+    if source not in STORAGE_USAGE_SOURCES:
+        raise ValueError(f"Unknown storage_usage_source {source!r}; use one of {', '.join(STORAGE_USAGE_SOURCES)}")
+    return STORAGE_USAGE_SOURCES[source]()
+
 
-storage_usage_provider: StorageUsageProvider = ConsoleWarpdriveStorageUsageProvider()
+storage_usage_provider: StorageUsageProvider = _make_provider()
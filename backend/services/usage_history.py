@@ -0,0 +1,127 @@
+"""
+Storage usage history with automatic downsampling.
+
+Every fresh Warpdrive stats fetch becomes one snapshot, written at three resolutions
+in one batch: raw (one slot per minute), hour and day. Usage is a gauge, so each slot
+keeps the latest value seen in it; coarser tiers are therefore maintained as samples
+arrive and need no separate rollup job. Each tier has its own retention, which bounds
+storage to roughly (2,880 raw + 2,160 hourly + 1,825 daily) rows per bucket; expired
+samples are pruned by the background SQLite maintenance task (core.maintenance), or,
+when SQLITE_MAINTENANCE_INTERVAL_SECONDS is 0, every PRUNE_INTERVAL_SECONDS while
+recording snapshots.
+"""
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from config import get_settings
+from core.database import get_usage_history_repo
+from repositories.interfaces import UsageHistoryRepository
+
+logger = logging.getLogger(__name__)
+
+RAW = "raw"
+HOUR = "hour"
+DAY = "day"
+SLOT_SECONDS = {RAW: 60, HOUR: 3600, DAY: 86400}
+
+OWNER_TOTAL = ""  # bucket_name used for the owner's total usage
+PRUNE_INTERVAL_SECONDS = 600
+
+_last_prune = 0.0
+
+
+class UsagePoint(BaseModel):
+    ts: datetime
+    object_count: int
+    total_size: int
+
+
+class UsageHistory(BaseModel):
+    resolution: str
+    bucket: Optional[str] = None
+    points: List[UsagePoint]
+
+
+def retention_seconds() -> Dict[str, int]:
+    settings = get_settings()
+    return {
+        RAW: settings.usage_raw_retention_hours * 3600,
+        HOUR: settings.usage_hourly_retention_days * 86400,
+        DAY: settings.usage_daily_retention_days * 86400,
+    }
+
+
+def pick_resolution(start_ts: int, end_ts: int, now: int) -> str:
+    """Finest tier that still covers `start_ts` and keeps the point count modest."""
+    retention = retention_seconds()
+    span = end_ts - start_ts
+    if span <= 2 * 86400 and now - start_ts <= retention[RAW]:
+        return RAW
+    if span <= 90 * 86400 and now - start_ts <= retention[HOUR]:
+        return HOUR
+    return DAY
+
+
+async def record_snapshot(owner_id: str, stats_by_name: Dict[str, Tuple[int, int]], now: Optional[float] = None) -> None:
+    """Record one usage snapshot (per bucket and owner total) into every tier."""
+    now = int(now if now is not None else time.time())
+    total_objects = sum(c for c, _ in stats_by_name.values())
+    total_size = sum(s for _, s in stats_by_name.values())
+    series = [(OWNER_TOTAL, total_objects, total_size)]
+    series += [(name, count, size) for name, (count, size) in stats_by_name.items()]
+    samples = [
+        (resolution, name, now - now % slot, count, size)
+        for resolution, slot in SLOT_SECONDS.items()
+        for name, count, size in series
+    ]
+    try:
+        await get_usage_history_repo().record(owner_id, samples)
+        if get_settings().sqlite_maintenance_interval_seconds <= 0:
+            await _maybe_prune(now)
+    except Exception as e:  # history is best-effort; never fail the request that fetched stats
+        logger.warning("Usage history: failed to record snapshot for owner_id=%s: %s", owner_id[:16], e)
+
+
+async def prune(repo: Optional[UsageHistoryRepository] = None, now: Optional[float] = None) -> int:
+    """Delete samples past their tier's retention; returns rows deleted."""
+    now = int(now if now is not None else time.time())
+    cutoffs = {resolution: now - keep for resolution, keep in retention_seconds().items()}
+    return await (repo or get_usage_history_repo()).prune(cutoffs)
+
+
+async def _maybe_prune(now: int) -> None:
+    """Fallback for when background maintenance is off."""
+    global _last_prune
+    if now - _last_prune < PRUNE_INTERVAL_SECONDS:
+        return
+    _last_prune = now
+    await prune(now=now)
+
+
+async def get_history(
+    owner_id: str,
+    start: datetime,
+    end: datetime,
+    bucket: Optional[str] = None,
+) -> UsageHistory:
+    start_ts, end_ts = int(start.timestamp()), int(end.timestamp())
+    resolution = pick_resolution(start_ts, end_ts, int(time.time()))
+    rows = await get_usage_history_repo().query(
+        owner_id, bucket or OWNER_TOTAL, resolution, start_ts - start_ts % SLOT_SECONDS[resolution], end_ts
+    )
+    return UsageHistory(
+        resolution=resolution,
+        bucket=bucket,
+        points=[
+            UsagePoint(
+                ts=datetime.fromtimestamp(r["ts"], tz=timezone.utc),
+                object_count=r["object_count"],
+                total_size=r["total_size"],
+            )
+            for r in rows
+        ],
+    )
@@ -0,0 +1,182 @@
+"""
+Push-based usage: Warpdrive reports object put/delete deltas, Console keeps per-bucket counters.
+
+Deltas posted to POST /api/buckets/usage/deltas are coalesced in memory per
+(owner_id, bucket) and written to bucket_counters in one batched upsert every
+USAGE_INGEST_FLUSH_SECONDS, or sooner once USAGE_INGEST_FLUSH_KEYS buckets are pending,
+so the write rate depends on the number of active buckets, not on the event rate. A
+failed flush keeps its deltas for the next one; once USAGE_INGEST_MAX_PENDING_KEYS
+buckets are pending, new batches are refused (503) until a flush succeeds. Each worker
+buffers its own deltas; the upsert adds them, so workers never overwrite each other.
+
+With STORAGE_USAGE_SOURCE=counters, bucket stats are read from these counters instead of
+Warpdrive (services.storage_usage_provider), and each flush records a usage history
+snapshot for the owners it touched, at most once per raw history slot. Buckets created in
+Console while counting get a zero counter right away (seed_new_bucket); buckets that
+predate counting have no baseline until Warpdrive pushes their totals as a first delta,
+and their stats are reported as unavailable until then.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from config import get_settings
+from core.database import get_bucket_counter_repo
+from services.usage_history import RAW, SLOT_SECONDS, record_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Bound on one delta, far above any real object or batch; keeps sums well inside SQLite's int64.
+MAX_DELTA = 2**53
+INT64_MAX = 2**63 - 1
+
+
+class UsageDelta(BaseModel):
+    owner_id: str = Field(..., min_length=1)
+    bucket: str = Field(..., min_length=1)
+    objects: int = Field(0, ge=-MAX_DELTA, le=MAX_DELTA, description="Change in object count (negative for deletes)")
+    bytes: int = Field(0, ge=-MAX_DELTA, le=MAX_DELTA, description="Change in stored bytes")
+
+
+class UsageAggregator:
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str], List[int]] = {}
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._recorded_slot: Dict[str, int] = {}  # owner_id -> last history slot written
+
+    @property
+    def pending_keys(self) -> int:
+        return len(self._pending)
+
+    def add(self, deltas: Iterable[UsageDelta]) -> bool:
+        """Buffer deltas; False (nothing buffered) if the backlog is full."""
+        settings = get_settings()
+        if len(self._pending) >= settings.usage_ingest_max_pending_keys:
+            return False
+        pending = self._pending
+        for delta in deltas:
+            counts = pending.get((delta.owner_id, delta.bucket))
+            if counts is None:
+                pending[(delta.owner_id, delta.bucket)] = [delta.objects, delta.bytes]
+            else:
+                counts[0] += delta.objects
+                counts[1] += delta.bytes
+        if len(pending) >= settings.usage_ingest_flush_keys:
+            self._full.set()
+        return True
+
+    def wake(self) -> None:
+        """End the current wait_until_due early."""
+        self._full.set()
+
+    async def wait_until_due(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._full.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._full.clear()
+
+    async def flush(self) -> int:
+        """Write pending deltas; returns the number of counters updated."""
+        async with self._lock:
+            batch, self._pending = self._pending, {}
+            rows = [(owner, bucket, objects, size) for (owner, bucket), (objects, size) in batch.items() if objects or size]
+            rows = self._drop_unstorable(rows)
+            if not rows:
+                return 0
+            apply = asyncio.ensure_future(get_bucket_counter_repo().apply_deltas(rows))
+            try:
+                await asyncio.shield(apply)
+            except asyncio.CancelledError:
+                # The write runs on the database thread and may still commit; wait for its
+                # outcome so the batch is neither lost nor added twice.
+                try:
+                    await apply
+                except Exception:
+                    self._merge_back(rows)
+                raise
+            except (OverflowError, ValueError, TypeError):
+                # The data, not the database: retrying would fail the same way forever.
+                logger.exception("Usage ingest: dropping a batch of %d counters that cannot be stored", len(rows))
+                return 0
+            except Exception:
+                self._merge_back(rows)
+                raise
+        await self._record_history({owner for owner, _, _, _ in rows})
+        return len(rows)
+
+    @staticmethod
+    def _drop_unstorable(rows: List[Tuple[str, str, int, int]]) -> List[Tuple[str, str, int, int]]:
+        """Log and drop sums that no longer fit a SQLite integer, so they can't block every later flush."""
+        kept = []
+        for row in rows:
+            if abs(row[2]) > INT64_MAX or abs(row[3]) > INT64_MAX:
+                logger.error("Usage ingest: dropping out-of-range delta for %s/%s: %d objects, %d bytes", *row)
+            else:
+                kept.append(row)
+        return kept
+
+    def _merge_back(self, rows: List[Tuple[str, str, int, int]]) -> None:
+        for owner, bucket, objects, size in rows:
+            counts = self._pending.setdefault((owner, bucket), [0, 0])
+            counts[0] += objects
+            counts[1] += size
+
+    async def _record_history(self, owners: Iterable[str]) -> None:
+        if get_settings().storage_usage_source != "counters":
+            return
+        slot = int(time.time()) // SLOT_SECONDS[RAW]
+        repo = get_bucket_counter_repo()
+        for owner in owners:
+            if self._recorded_slot.get(owner) == slot:
+                continue
+            self._recorded_slot[owner] = slot
+            await record_snapshot(owner, await repo.get_by_owner_id(owner))
+
+
+usage_aggregator = UsageAggregator()
+
+_task: Optional[asyncio.Task] = None
+_stop: Optional[asyncio.Event] = None
+
+
+async def seed_new_bucket(owner_id: str, bucket_name: str) -> None:
+    """Start counting a bucket Console just created: it is empty, so zero is its baseline."""
+    if get_settings().storage_usage_source == "counters":
+        await get_bucket_counter_repo().apply_deltas([(owner_id, bucket_name, 0, 0)])
+
+
+async def _loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        await usage_aggregator.wait_until_due(get_settings().usage_ingest_flush_seconds)
+        try:
+            await usage_aggregator.flush()
+        except Exception:
+            logger.exception("Usage ingest: flush failed; %d buckets pending", usage_aggregator.pending_keys)
+
+
+def start_usage_ingest() -> None:
+    global _task, _stop
+    if _task is None:
+        _stop = asyncio.Event()
+        _task = asyncio.create_task(_loop(_stop))
+
+
+async def stop_usage_ingest() -> None:
+    """Stop the flush loop and write whatever is still buffered."""
+    global _task, _stop
+    if _task is None:
+        return
+    # Not cancelled: the loop finishes the flush it is in (or wakes for one last one) and exits.
+    _stop.set()
+    usage_aggregator.wake()
+    await _task
+    _task, _stop = None, None
+    try:
+        await usage_aggregator.flush()
+    except Exception:
+        logger.exception("Usage ingest: final flush failed; %d buckets lost", usage_aggregator.pending_keys)
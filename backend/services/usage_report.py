@@ -0,0 +1,173 @@
+"""
+Platform-wide storage usage report for capacity planning.
+
+Walks every owner with an active API key and queries Warpdrive on their behalf with
+`concurrency` workers, so a full pass takes roughly tenants / concurrency round trips.
+Per-owner results are yielded as they complete; `UsageReportAggregator` folds them into
+platform totals, per-bucket-type totals and the top-N tenants by bytes stored.
+"""
+import asyncio
+import heapq
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from config import get_settings
+from core import deadline
+from core.database import get_api_key_repo, get_bucket_repo
+from repositories.interfaces import ApiKeyRow
+from services.warpdrive_client import WarpdriveUnavailable, list_buckets_with_stats
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY_SECONDS = 0.2
+
+
+class TypeUsage(BaseModel):
+    buckets: int = 0
+    object_count: int = 0
+    total_size: int = 0
+
+
+class OwnerUsage(BaseModel):
+    owner_id: str
+    bucket_count: int = 0
+    object_count: int = 0
+    total_size: int = 0
+    by_type: Dict[str, TypeUsage] = {}
+    stats_available: bool = True
+    error: Optional[str] = None
+
+
+class TenantUsage(BaseModel):
+    owner_id: str
+    total_size: int
+    object_count: int
+    bucket_count: int
+
+
+class UsageReportSummary(BaseModel):
+    owners: int = 0
+    owners_unavailable: int = 0
+    bucket_count: int = 0
+    object_count: int = 0
+    total_size: int = 0
+    by_type: Dict[str, TypeUsage] = {}
+    top_tenants: List[TenantUsage] = []
+
+
+class UsageReportAggregator:
+    """Incrementally folds OwnerUsage results; keeps only a top-N heap, not every owner."""
+
+    def __init__(self, top_n: int = 10):
+        self.top_n = top_n
+        self._summary = UsageReportSummary()
+        self._top: List[Tuple[int, str, OwnerUsage]] = []
+
+    def add(self, usage: OwnerUsage) -> None:
+        summary = self._summary
+        summary.owners += 1
+        if not usage.stats_available:
+            summary.owners_unavailable += 1
+        summary.bucket_count += usage.bucket_count
+        summary.object_count += usage.object_count
+        summary.total_size += usage.total_size
+        for bucket_type, t in usage.by_type.items():
+            acc = summary.by_type.setdefault(bucket_type, TypeUsage())
+            acc.buckets += t.buckets
+            acc.object_count += t.object_count
+            acc.total_size += t.total_size
+        entry = (usage.total_size, usage.owner_id, usage)
+        if len(self._top) < self.top_n:
+            heapq.heappush(self._top, entry)
+        elif self.top_n and entry[:2] > self._top[0][:2]:
+            heapq.heapreplace(self._top, entry)
+
+    def summary(self) -> UsageReportSummary:
+        top = sorted(self._top, key=lambda e: e[:2], reverse=True)
+        self._summary.top_tenants = [
+            TenantUsage(
+                owner_id=u.owner_id,
+                total_size=u.total_size,
+                object_count=u.object_count,
+                bucket_count=u.bucket_count,
+            )
+            for _, _, u in top
+        ]
+        return self._summary
+
+
+async def _fetch_with_retry(key_row: ApiKeyRow, retries: int) -> List[dict]:
+    attempt = 0
+    while True:
+        try:
+            return await list_buckets_with_stats(key_row["access_key"], key_row["secret_key"])
+        except WarpdriveUnavailable:
+            if attempt >= retries:
+                raise
+            await asyncio.sleep(RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+            attempt += 1
+
+
+async def _owner_usage(key_row: ApiKeyRow, retries: int) -> OwnerUsage:
+    owner_id = key_row["owner_id"]
+    usage = OwnerUsage(owner_id=owner_id)
+    try:
+        bucket_rows = await get_bucket_repo().list_by_owner_id(owner_id)
+        try:
+            stats = {b["name"]: b for b in await _fetch_with_retry(key_row, retries)}
+        except WarpdriveUnavailable as e:
+            stats = {}
+            usage.stats_available = False
+            usage.error = str(e)
+        for row in bucket_rows:
+            bucket_type = row.get("type") or "general_purpose"
+            b = stats.get(row["bucket_name"], {})
+            t = usage.by_type.setdefault(bucket_type, TypeUsage())
+            t.buckets += 1
+            t.object_count += b.get("object_count", 0)
+            t.total_size += b.get("total_size", 0)
+            usage.bucket_count += 1
+            usage.object_count += b.get("object_count", 0)
+            usage.total_size += b.get("total_size", 0)
+    except Exception as e:  # one bad tenant must not stall the whole report
+        logger.warning("Usage report: owner_id=%s failed: %s", owner_id[:16], e)
+        usage.stats_available = False
+        usage.error = str(e)
+    return usage
+
+
+async def iter_owner_usage(
+    concurrency: Optional[int] = None,
+    retries: Optional[int] = None,
+) -> AsyncIterator[OwnerUsage]:
+    """Yield OwnerUsage for every owner with an active key, in completion order."""
+    settings = get_settings()
+    concurrency = max(1, concurrency or settings.usage_report_concurrency)
+    retries = settings.usage_report_retries if retries is None else retries
+
+    key_rows = await get_api_key_repo().list_active()
+    pending: asyncio.Queue = asyncio.Queue()
+    for row in key_rows:
+        pending.put_nowait(row)
+    # Bounded so slow consumers (a streaming client) apply backpressure to the workers.
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+
+    async def worker() -> None:
+        # The report outlives the triggering request's budget; each call keeps its own timeout.
+        with deadline.unbounded():
+            while True:
+                try:
+                    row = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await results.put(await _owner_usage(row, retries))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(key_rows)))]
+    try:
+        for _ in range(len(key_rows)):
+            yield await results.get()
+    finally:
+        for w in workers:
+            w.cancel()
@@ -1,38 +1,82 @@
 """
 HTTP client for Warpdrive S3-compatible API. Signs requests with user's API key (SigV4).
-Used to fetch list-buckets-with-stats for merging with Console bucket list.
+Used to fetch list-buckets-with-stats for merging with Console bucket list, or the stats
+of a single bucket for bucket detail pages.
+
+Async callers go through `list_buckets_with_stats`, which runs the blocking request on a
+dedicated bounded executor, caps it by the current request's deadline and fails fast
+while the Warpdrive circuit breaker is open.
 """
 from __future__ import annotations
 
+import asyncio
+import functools
 import logging
-from typing import List, Optional
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from urllib.parse import quote, urlparse
 
 import requests
 from requests_aws4auth import AWS4Auth
 
 from config import get_settings
+from core import deadline
+from services.circuit_breaker import OPEN, CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
+# Below this much remaining request budget a Warpdrive call is not worth starting.
+MIN_CALL_SECONDS = 0.05
+
+_breaker: Optional[CircuitBreaker] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+# Statuses meaning "this Warpdrive has no per-bucket stats endpoint" rather than an error.
+UNSUPPORTED_STATUSES = (400, 405, 501)
+
+
+class WarpdriveUnavailable(Exception):
+    """Warpdrive could not answer in time: request failed, breaker open or deadline spent."""
+
+
+class WarpdriveNotSupported(Exception):
+    """Warpdrive answered but does not support the call; use the full listing instead."""
+
+
+def get_breaker() -> CircuitBreaker:
+    global _breaker
+    if _breaker is None:
+        settings = get_settings()
+        _breaker = CircuitBreaker(
+            "warpdrive",
+            failure_threshold=settings.warpdrive_breaker_failure_threshold,
+            reset_timeout=settings.warpdrive_breaker_reset_seconds,
+        )
+    return _breaker
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_settings().warpdrive_max_workers,
+            thread_name_prefix="warpdrive",
+        )
+    return _executor
+
 
 def get_warpdrive_url() -> Optional[str]:
     url = get_settings().warpdrive_url
     return url.strip() if url else None
 
 
-def list_buckets_with_stats_sync(access_key: str, secret_key: str) -> List[dict]:
-    """
-    Call Warpdrive GET /s3/ with SigV4 using the given credentials.
-    Returns list of {"name": str, "object_count": int, "total_size": int}.
-    On missing URL or request failure, returns [].
-    """
+def _signed_get(path: str, access_key: str, secret_key: str, timeout: float) -> requests.Response:
     base = get_warpdrive_url()
     if not base:
-        return []
+        raise WarpdriveUnavailable("WARPDRIVE_URL not set")
     base = base.rstrip("/")
-    # Use /s3 (no trailing slash) so the signed path matches what Warpdrive sees (path can differ with /s3/)
-    url = f"{base}/s3"
+    url = f"{base}{path}"
 
     # requests_aws4auth uses urlparse().netloc.split(':')[0] for Host when not set, which drops the port.
     # Warpdrive sees Host: localhost:9710, so we must sign with that. Set Host explicitly so the signer uses it.
@@ -43,25 +87,133 @@ def list_buckets_with_stats_sync(access_key: str, secret_key: str) -> List[dict]
 
     region = "us-east-1"
     auth = AWS4Auth(access_key, secret_key, region, "s3")
+    return requests.get(url, auth=auth, headers={"Host": host_header}, timeout=timeout)
+
 
+def _bucket_stats(b: dict) -> dict:
+    return {
+        "name": b.get("name", ""),
+        "object_count": int(b.get("object_count", 0)),
+        "total_size": int(b.get("total_size", 0)),
+    }
+
+
+def fetch_buckets_with_stats_sync(access_key: str, secret_key: str, timeout: float = 10) -> List[dict]:
+    """
+    Call Warpdrive GET /s3 with SigV4 using the given credentials.
+    Returns list of {"name": str, "object_count": int, "total_size": int}; raises on failure.
+    """
+    # Use /s3 (no trailing slash) so the signed path matches what Warpdrive sees (path can differ with /s3/)
+    r = _signed_get("/s3", access_key, secret_key, timeout)
+    r.raise_for_status()
+    buckets = r.json().get("buckets") or []
+    if buckets:
+        logger.info("Warpdrive GET /s3 ok: %s buckets with stats", len(buckets))
+    return [_bucket_stats(b) for b in buckets]
+
+
+def fetch_bucket_stats_sync(access_key: str, secret_key: str, bucket_name: str, timeout: float = 10) -> dict:
+    """
+    Call Warpdrive GET /s3/{bucket}?stats for one bucket.
+    Returns {"name", "object_count", "total_size"}. Raises WarpdriveNotSupported if this
+    Warpdrive does not offer the call (an S3-style server answers that path with an XML
+    object listing), and WarpdriveUnavailable on 404, as the stats are then unknown.
+    """
+    r = _signed_get(f"/s3/{quote(bucket_name, safe='')}?stats", access_key, secret_key, timeout)
+    if r.status_code == 404:
+        raise WarpdriveUnavailable(f"GET /s3/{{bucket}}?stats returned 404 for {bucket_name}")
+    if r.status_code in UNSUPPORTED_STATUSES:
+        raise WarpdriveNotSupported(f"GET /s3/{{bucket}}?stats returned {r.status_code}")
+    r.raise_for_status()
     try:
-        r = requests.get(url, auth=auth, headers={"Host": host_header}, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        buckets = data.get("buckets") or []
-        if buckets:
-            logger.info("Warpdrive GET /s3 ok: %s buckets with stats", len(buckets))
-        return [
-            {
-                "name": b.get("name", ""),
-                "object_count": int(b.get("object_count", 0)),
-                "total_size": int(b.get("total_size", 0)),
-            }
-            for b in buckets
-        ]
-    except requests.RequestException as e:
-        logger.warning("Warpdrive GET /s3/ failed (stats will show 0): %s", e)
-        return []
+        body = r.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict) or "object_count" not in body:
+        raise WarpdriveNotSupported("GET /s3/{bucket}?stats did not return a stats object")
+    stats = _bucket_stats(body)
+    stats["name"] = bucket_name
+    return stats
+
+
+class _Uncounted:
+    """Stands in for the breaker on calls whose outcome must not move it."""
+
+    def record_success(self) -> None:
+        pass
+
+    def record_failure(self) -> None:
+        pass
+
+    def release(self) -> None:
+        pass
+
+
+async def _call(fn: Callable, *args, counted: bool = True) -> object:
+    """
+    Run a blocking Warpdrive call under the circuit breaker and the request deadline.
+    Uncounted calls (optional, possibly unsupported endpoints) still fail fast while the
+    breaker is open, but neither take a half-open probe nor record their outcome.
+    """
+    timeout = get_settings().warpdrive_timeout_seconds
+    left = deadline.remaining()
+    if left is not None:
+        if left < MIN_CALL_SECONDS:
+            raise WarpdriveUnavailable("request deadline exhausted")
+        timeout = min(timeout, left)
+    breaker = get_breaker()
+    if not counted:
+        if breaker.state == OPEN:
+            raise WarpdriveUnavailable("circuit open")
+        breaker = _Uncounted()
+    elif not breaker.allow():
+        raise WarpdriveUnavailable("circuit open")
+
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, timeout=timeout)
+    try:
+        # wait_for also bounds time spent queued behind other calls in the executor
+        result = await asyncio.wait_for(loop.run_in_executor(_get_executor(), call), timeout)
+    except WarpdriveNotSupported:
+        breaker.record_success()
+        raise
+    except WarpdriveUnavailable:
+        # Raised by the call itself for an answer that carries no stats, not an outage.
+        breaker.release()
+        raise
+    except asyncio.TimeoutError as e:
+        breaker.record_failure()
+        raise WarpdriveUnavailable(f"no response within {timeout:.2f}s") from e
+    except requests.HTTPError as e:
+        # A 4xx (e.g. a revoked key) is the caller's problem, not a sign Warpdrive is down.
+        if e.response is not None and e.response.status_code < 500:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        raise WarpdriveUnavailable(str(e)) from e
+    except (requests.RequestException, ValueError) as e:
+        breaker.record_failure()
+        raise WarpdriveUnavailable(str(e)) from e
     except Exception as e:
-        logger.warning("Warpdrive list_buckets_with_stats error (stats will show 0): %s", e)
-        return []
+        # An unexpected answer (e.g. a body of the wrong shape) degrades stats like any failure.
+        breaker.record_failure()
+        raise WarpdriveUnavailable(f"unexpected error: {e!r}") from e
+    except BaseException:
+        # Cancelled (client gone, outer timeout): no outcome, but free a half-open probe slot.
+        breaker.release()
+        raise
+    breaker.record_success()
+    return result
+
+
+async def list_buckets_with_stats(access_key: str, secret_key: str) -> List[dict]:
+    """Async GET /s3; raises WarpdriveUnavailable instead of returning zeroed stats."""
+    return await _call(fetch_buckets_with_stats_sync, access_key, secret_key)
+
+
+async def get_bucket_stats(access_key: str, secret_key: str, bucket_name: str) -> dict:
+    """
+    Async GET /s3/{bucket}?stats; raises WarpdriveUnavailable or WarpdriveNotSupported.
+    Not counted by the breaker, so a Warpdrive without this call cannot open it.
+    """
+    return await _call(fetch_bucket_stats_sync, access_key, secret_key, bucket_name, counted=False)
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SERVICE_SECRET = "test-service-secret"
+_work = tempfile.mkdtemp(prefix="vitality-tests-")
+os.environ.update({
+    "SECRET_KEY": "test",
+    "WARPDRIVE_SERVICE_SECRET": SERVICE_SECRET,
+    "DATABASE_PATH": os.path.join(_work, "vitality.db"),
+    "BACKUP_DIR": os.path.join(_work, "backups"),
+    "BCRYPT_ROUNDS": "4",
+    "RATE_LIMIT_ENABLED": "false",
+    "LOOP_MONITOR_ENABLED": "false",
+})
+os.environ.pop("CREDENTIAL_SOCKET_PATH", None)
+os.environ.pop("WARPDRIVE_URL", None)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # One app lifespan (and event loop) for the whole run: module-level asyncio
+    # primitives such as the usage aggregator's are bound to the loop that first uses them.
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def user(client):
+    """(email, auth headers) of a freshly registered user."""
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    r = client.post("/api/auth/register", json={"email": email, "password": "correct horse"})
+    assert r.status_code == 200, r.text
+    return email, {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+@pytest.fixture
+def service_headers():
+    return {"X-Warpdrive-Secret": SERVICE_SECRET}
@@ -0,0 +1,64 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from services.policy_engine import PolicyError, compile_policy
+
+UNSUPPORTED = [
+    {"Effect": "Allow", "Principal": "*", "Action": "s3:GetObject", "Resource": "*",
+     "Condition": {"IpAddress": {"aws:SourceIp": "10.0.0.0/8"}}},
+    {"Effect": "Allow", "NotPrincipal": "evil@x", "Action": "s3:GetObject", "Resource": "*"},
+    {"Effect": "Deny", "Principal": "*", "NotAction": "s3:GetObject", "Resource": "*"},
+]
+
+
+def _policy(*statements) -> str:
+    return json.dumps({"Statement": list(statements)})
+
+
+@pytest.mark.parametrize("statement", UNSUPPORTED)
+def test_compile_rejects_unsupported_keys(statement):
+    with pytest.raises(PolicyError, match="Unsupported statement keys"):
+        compile_policy(_policy(statement), "photos")
+
+
+@pytest.mark.parametrize("statement", UNSUPPORTED)
+def test_create_bucket_rejects_unsupported_keys(client, user, statement):
+    _, headers = user
+    r = client.post("/api/buckets/", json={"name": "photos", "access_policies": _policy(statement)}, headers=headers)
+    assert r.status_code == 400
+    assert "Unsupported statement keys" in r.json()["detail"]
+
+
+@pytest.mark.parametrize("statement", UNSUPPORTED)
+def test_stored_policy_with_unsupported_keys_denies(client, user, service_headers, statement):
+    """A policy stored before validation grants nothing beyond the owner."""
+    owner, headers = user
+    # Allow-all plus the unsupported statement: were the latter dropped, the former would grant.
+    stored = _policy({"Effect": "Allow", "Principal": "*", "Action": "s3:*", "Resource": "*"}, statement)
+    assert client.post("/api/buckets/", json={"name": "photos"}, headers=headers).status_code == 201
+    with sqlite3.connect(os.environ["DATABASE_PATH"]) as db:
+        db.execute("UPDATE buckets SET access_policies = ? WHERE owner_id = ? AND bucket_name = 'photos'", (stored, owner))
+
+    requests = [
+        {"principal": principal, "owner_id": owner, "bucket": "photos", "action": action, "key": "a.txt"}
+        for principal, action in [("stranger@x", "s3:GetObject"), ("evil@x", "s3:GetObject"), ("stranger@x", "s3:DeleteObject")]
+    ]
+    r = client.post("/api/buckets/authorize", json={"requests": requests}, headers=service_headers)
+    assert r.status_code == 200
+    assert [d["allowed"] for d in r.json()["decisions"]] == [False, False, False]
+
+
+def test_supported_policy_still_applies(client, user, service_headers):
+    owner, headers = user
+    policy = _policy({"Sid": "public", "Effect": "Allow", "Principal": "*", "Action": "s3:GetObject", "Resource": "public/*"})
+    r = client.post("/api/buckets/", json={"name": "photos", "access_policies": policy}, headers=headers)
+    assert r.status_code == 201
+    requests = [
+        {"principal": "stranger@x", "owner_id": owner, "bucket": "photos", "action": "s3:GetObject", "key": key}
+        for key in ("public/a.txt", "private/a.txt")
+    ]
+    r = client.post("/api/buckets/authorize", json={"requests": requests}, headers=service_headers)
+    assert [d["reason"] for d in r.json()["decisions"]] == ["allow", "default"]
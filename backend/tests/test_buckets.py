@@ -0,0 +1,14 @@
+def test_reserved_bucket_name_is_rejected(client, user):
+    _, headers = user
+    r = client.post("/api/buckets/", json={"name": "usage"}, headers=headers)
+    assert r.status_code == 400
+    assert "reserved" in r.json()["detail"]
+
+
+def test_get_bucket_by_name(client, user):
+    _, headers = user
+    assert client.post("/api/buckets/", json={"name": "usage-logs"}, headers=headers).status_code == 201
+    r = client.get("/api/buckets/usage-logs", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["name"] == "usage-logs"
+    assert client.get("/api/buckets/usage", headers=headers).json().keys() >= {"storage_used", "storage_quota"}
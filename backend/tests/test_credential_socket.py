@@ -0,0 +1,56 @@
+import asyncio
+import os
+import tempfile
+
+from core.credential_socket import NOT_FOUND, OK, TOO_LARGE, CredentialSocketClient, _handle, _ResolvedCache
+from core.database import get_api_key_repo, get_bucket_repo
+from services.key_filter import key_filter
+
+SECRET = "socket-secret"
+
+
+async def _with_socket(lookups):
+    path = os.path.join(tempfile.mkdtemp(), "credentials.sock")
+    server = await asyncio.start_unix_server(lambda r, w: _handle(r, w, SECRET.encode(), _ResolvedCache(0)), path=path)
+    try:
+        client = await CredentialSocketClient.connect(path, SECRET)
+        try:
+            return await client.lookup_many(lookups)
+        finally:
+            await client.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_bundle_too_large_for_a_frame(client, user):
+    owner, _ = user
+
+    async def setup():
+        buckets = get_bucket_repo()
+        for i in range(1000):
+            await buckets.create_if_absent({
+                "bucket_name": f"bucket-{i:04d}-" + "x" * 50, "owner_id": owner, "access_policies": None,
+                "type": "general_purpose", "created_at": "2026-01-01T00:00:00",
+            })
+        await get_api_key_repo().create("AKBIGOWNER0000000000", owner, "s" * 40)
+        key_filter.add("AKBIGOWNER0000000000")
+
+    client.portal.call(setup)
+    results = client.portal.call(_with_socket, [("AKBIGOWNER0000000000", None), ("AKUNKNOWN00000000000", None)])
+    # The oversized bundle is refused without breaking the connection for the lookups behind it.
+    assert [status for status, _ in results] == [TOO_LARGE, NOT_FOUND]
+
+
+def test_bundle_within_a_frame(client, user):
+    owner, _ = user
+
+    async def setup():
+        await get_api_key_repo().create("AKSMALLOWNER00000000", owner, "s" * 40)
+        key_filter.add("AKSMALLOWNER00000000")
+
+    client.portal.call(setup)
+    [(status, bundle)] = client.portal.call(_with_socket, [("AKSMALLOWNER00000000", None)])
+    assert status == OK
+    assert bundle.owner_id == owner
+    assert [b.name for b in bundle.buckets] == ["default"]
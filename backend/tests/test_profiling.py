@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+
+from core.profiling import ProfileInfo, ProfileStore
+
+
+def _info(profile_id: str, minutes: int) -> ProfileInfo:
+    return ProfileInfo(
+        id=profile_id, method="GET", path="/api/buckets/", status=200, duration_ms=1.0, samples=1,
+        created_at=datetime(2026, 1, 1) + timedelta(minutes=minutes),
+    )
+
+
+def test_profiles_are_shared_between_workers(tmp_path):
+    # Two stores on one directory stand in for two serve.py workers.
+    recording, serving = ProfileStore(str(tmp_path), 2), ProfileStore(str(tmp_path), 2)
+    recording.add(_info("00000000000000a1", 1), {"name": "first"})
+    serving.add(_info("00000000000000a2", 2), {"name": "second"})
+    recording.add(_info("00000000000000a3", 3), {"name": "third"})
+
+    assert [info.id for info in serving.list()] == ["00000000000000a3", "00000000000000a2"]
+    assert serving.get("00000000000000a3") == {"name": "third"}
+    assert serving.get("00000000000000a1") is None  # pruned past max_entries
+    assert serving.get("../../etc/passwd") is None
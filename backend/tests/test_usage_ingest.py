@@ -0,0 +1,28 @@
+from services.usage_ingest import INT64_MAX, MAX_DELTA, UsageAggregator, UsageDelta
+
+
+def _post(client, service_headers, **delta):
+    body = {"deltas": [{"owner_id": "u@example.com", "bucket": "photos", "objects": 1, "bytes": 1, **delta}]}
+    return client.post("/api/buckets/usage/deltas", json=body, headers=service_headers)
+
+
+def test_out_of_range_and_empty_deltas_are_rejected(client, service_headers):
+    assert _post(client, service_headers, bytes=2**70).status_code == 422
+    assert _post(client, service_headers, objects=-MAX_DELTA - 1).status_code == 422
+    assert _post(client, service_headers, owner_id="").status_code == 422
+    assert _post(client, service_headers, bucket="").status_code == 422
+    assert _post(client, service_headers, bytes=MAX_DELTA).status_code == 202
+
+
+def test_unstorable_sums_are_dropped_not_retried(client):
+    """A sum past int64 is logged and dropped; it must not stay buffered and fail every flush."""
+
+    async def run():
+        aggregator = UsageAggregator()
+        aggregator.add([UsageDelta(owner_id="u@example.com", bucket="huge", bytes=1)])
+        aggregator._pending[("u@example.com", "huge")][1] = INT64_MAX + 1
+        aggregator.add([UsageDelta(owner_id="u@example.com", bucket="fine", objects=1, bytes=5)])
+        written = await aggregator.flush()
+        return written, aggregator.pending_keys
+
+    assert client.portal.call(run) == (1, 0)
@@ -28,12 +28,14 @@ interface BucketSummary {
   total_size: number;
   type?: string;
   access_policies?: string | null;
+  stats_available?: boolean;
 }
 
 interface UsageSummary {
   storage_used: number;
   storage_quota: number;
   object_count: number;
+  stats_available?: boolean;
 }
 
 interface User {
@@ -949,7 +951,9 @@ function App() {
                               <Typography variant="body2" color="text.secondary">
                                 {bucket.type === 'ai_training' ? 'AI training' : 'General purpose'}
                                 {' • '}
-                                {bucket.object_count} objects • {formatSize(bucket.total_size)}
+                                {bucket.stats_available === false
+                                  ? 'Stats temporarily unavailable'
+                                  : `${bucket.object_count} objects • ${formatSize(bucket.total_size)}`}
                               </Typography>
                             </CardContent>
                           </Card>